@@ -0,0 +1,123 @@
+"""
+Bulk research report generation with bounded concurrency and shared per-company retrieval
+
+Usage:
+    python batch.py requests.jsonl --concurrency 8 --output results.ndjson
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import uuid
+from collections import OrderedDict
+from typing import List, Dict, Any, AsyncIterator, Optional, Tuple
+from models import ResearchRequest
+from metrics import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_BATCH_CONCURRENCY = int(os.getenv("RESEARCH_BATCH_CONCURRENCY", "4"))
+
+def group_by_company(requests: List[ResearchRequest]) -> "OrderedDict[str, List[Tuple[int, ResearchRequest]]]":
+    """Group (row index, request) pairs by company code, preserving first-seen order"""
+    groups = OrderedDict()
+    for index, request in enumerate(requests):
+        groups.setdefault(request.company_code, []).append((index, request))
+    return groups
+
+def _assign_thread_ids(requests: List[ResearchRequest]) -> List[ResearchRequest]:
+    """Give rows still on the default thread their own thread so checkpoints don't collide"""
+    batch_id = uuid.uuid4().hex[:8]
+    return [
+        request.model_copy(update={"thread_id": f"batch-{batch_id}-{index}"})
+        if request.thread_id == "default" else request
+        for index, request in enumerate(requests)
+    ]
+
+async def run_batch(requests: List[ResearchRequest], concurrency: int = DEFAULT_BATCH_CONCURRENCY) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Run many research requests and yield one result dict per row as each completes
+    
+    Context is retrieved once per company_code and shared by all of that company's rows;
+    at most `concurrency` retrievals or graph runs are in flight at any time.
+    """
+    from research_service import run_research, retrieve_context
+    
+    requests = _assign_thread_ids(requests)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    results: asyncio.Queue = asyncio.Queue()
+    
+    async def run_row(index: int, request: ResearchRequest, context: Optional[str]):
+        async with semaphore:
+            try:
+                response = await run_research(request, research_context=context)
+                result = response.model_dump()
+            except Exception as e:
+                result = {
+                    "company_code": request.company_code,
+                    "sector_code": request.sector_code,
+                    "report_type": request.report_type,
+                    "thread_id": request.thread_id,
+                    "status": "error",
+                    "error": str(e)
+                }
+        result["index"] = index
+        await results.put(result)
+    
+    async def run_company(company_code: str, rows: List[Tuple[int, ResearchRequest]]):
+        context = None
+        async with semaphore:
+            try:
+                context = await retrieve_context(company_code)
+            except Exception as e:
+                # Logged, not printed: the CLI writes NDJSON results to stdout
+                logger.warning("Shared retrieval failed for %s, rows will retrieve individually: %s", company_code, e)
+        await asyncio.gather(*(run_row(index, request, context) for index, request in rows))
+    
+    tasks = [
+        asyncio.create_task(run_company(company_code, rows))
+        for company_code, rows in group_by_company(requests).items()
+    ]
+    try:
+        for _ in range(len(requests)):
+            yield await results.get()
+    finally:
+        # Stop outstanding work if the consumer goes away (e.g. client disconnect)
+        for task in tasks:
+            task.cancel()
+
+def load_requests_jsonl(path: str) -> List[ResearchRequest]:
+    """Load research requests from a JSONL file, one request object per line"""
+    requests = []
+    with open(path, 'r', encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                requests.append(ResearchRequest(**json.loads(line)))
+    return requests
+
+async def _run_cli(args):
+    requests = load_requests_jsonl(args.input)
+    print(f"🚀 Running {len(requests)} research requests with concurrency {args.concurrency}", file=sys.stderr)
+    
+    output = open(args.output, 'w', encoding="utf-8") if args.output else sys.stdout
+    try:
+        async for result in run_batch(requests, args.concurrency):
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate research reports for every row of a JSONL file")
+    parser.add_argument("input", help="JSONL file with one ResearchRequest per line")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_BATCH_CONCURRENCY,
+                        help="Maximum number of research graphs to run concurrently")
+    parser.add_argument("--output", help="Write NDJSON results here instead of stdout")
+    asyncio.run(_run_cli(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
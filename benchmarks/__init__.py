@@ -0,0 +1,6 @@
+"""
+Offline micro-benchmarks for the research agent
+
+Run from the repository root:
+    python -m benchmarks.run_benchmarks --output benchmarks/results/latest.json
+"""
@@ -0,0 +1,88 @@
+"""
+Compare embedding backends: load time, query latency, ingestion throughput and
+cosine drift against the PyTorch reference. Needs the model weights (not offline).
+
+Usage:
+    python -m benchmarks.embedding_backends --backends torch onnx onnx-int8 --threads 4
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+from benchmarks.run_benchmarks import REPO_ROOT, DOCS_DIR, measure
+
+QUERIES = [
+    "AAPL financial performance business overview",
+    "Q3 FY24 services revenue",
+    "MSFT Azure growth and cloud margins",
+    "GOOGL advertising revenue risks",
+]
+
+def load_chunks(multiplier: int):
+    from ingestion import split_file
+    
+    chunks = []
+    for path in sorted(glob.glob(os.path.join(DOCS_DIR, "*.md"))):
+        chunks.extend(split_file(path)["texts"])
+    return chunks * multiplier
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark embedding backends")
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx-int8"])
+    parser.add_argument("--threads", type=int, default=0, help="Intra-op threads (0 = library default)")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--corpus-multiplier", type=int, default=20)
+    parser.add_argument("--output", help="Write JSON results here (default: stdout)")
+    args = parser.parse_args()
+    sys.path.insert(0, REPO_ROOT)
+    
+    from embedding_backends import SentenceTransformerBackendEmbeddings, check_parity
+    
+    chunks = load_chunks(args.corpus_multiplier)
+    reference = None
+    results = {"chunks": len(chunks), "threads": args.threads, "batch_size": args.batch_size, "backends": {}}
+    
+    for backend in args.backends:
+        print(f"⏱️  Benchmarking {backend} embeddings...", file=sys.stderr)
+        started = time.perf_counter()
+        embeddings = SentenceTransformerBackendEmbeddings(
+            backend=backend, threads=args.threads, batch_size=args.batch_size
+        )
+        load_seconds = time.perf_counter() - started
+        
+        counter = {"i": 0}
+        def query():
+            counter["i"] += 1
+            embeddings.embed_query(QUERIES[counter["i"] % len(QUERIES)])
+        
+        started = time.perf_counter()
+        embeddings.embed_documents(chunks)
+        ingest_seconds = time.perf_counter() - started
+        
+        if reference is None:
+            reference = embeddings if backend == "torch" else SentenceTransformerBackendEmbeddings(
+                backend="torch", threads=args.threads, batch_size=args.batch_size
+            )
+        
+        results["backends"][backend] = {
+            "load_seconds": load_seconds,
+            "query_latency": measure(query, args.repeat, warmup=3),
+            "ingest_seconds": ingest_seconds,
+            "ingest_chunks_per_second": len(chunks) / ingest_seconds if ingest_seconds else 0.0,
+            "parity": check_parity(embeddings, reference, QUERIES + chunks[:200])
+        }
+    
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
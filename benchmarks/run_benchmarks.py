@@ -0,0 +1,287 @@
+"""
+Micro-benchmark suite: chunking, ingestion and retrieval, prompt lookup, and the
+research graph end to end with a stub chat model. Runs fully offline and writes
+machine-readable JSON so runs can be compared over time.
+
+Usage:
+    python -m benchmarks.run_benchmarks --output benchmarks/results/latest.json
+    python -m benchmarks.run_benchmarks --only prompts graph --llm-latency-ms 50
+"""
+
+import argparse
+import asyncio
+import glob
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, Any, List
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DOCS_DIR = os.path.join(REPO_ROOT, "docs")
+COMPANY_CODES = ["AAPL", "GOOGL", "MSFT"]
+
+def measure(fn: Callable[[], Any], repeat: int, warmup: int = 1) -> Dict[str, float]:
+    """Time fn() repeatedly and summarize the latencies in milliseconds"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000.0)
+    samples.sort()
+    return {
+        "n": repeat,
+        "mean_ms": statistics.fmean(samples),
+        "p50_ms": samples[len(samples) // 2],
+        "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        "min_ms": samples[0],
+        "max_ms": samples[-1]
+    }
+
+def make_corpus(target_dir: str, multiplier: int) -> List[str]:
+    """Copy docs/ into target_dir `multiplier` times under distinct filenames"""
+    paths = []
+    for source in sorted(glob.glob(os.path.join(DOCS_DIR, "*.md"))):
+        company_code = os.path.basename(source).split("_")[0]
+        for i in range(multiplier):
+            path = os.path.join(target_dir, f"{company_code}_research_{i:04d}.md")
+            shutil.copyfile(source, path)
+            paths.append(path)
+    return paths
+
+def bench_chunking(args) -> Dict[str, Any]:
+    from ingestion import split_file
+    
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        paths = make_corpus(corpus_dir, args.corpus_multiplier)
+        chunks = sum(len(split_file(path)["ids"]) for path in paths)
+        timing = measure(lambda: [split_file(path) for path in paths], args.repeat)
+    return {
+        "files": len(paths),
+        "chunks": chunks,
+        "timing": timing,
+        "chunks_per_second": chunks / (timing["mean_ms"] / 1000.0) if timing["mean_ms"] else 0.0
+    }
+
+def bench_vector_store(args) -> Dict[str, Any]:
+    from benchmarks.stubs import HashingEmbeddings
+    from vector_store import ResearchVectorStore
+    
+    with tempfile.TemporaryDirectory() as work_dir:
+        corpus_dir = os.path.join(work_dir, "docs")
+        os.makedirs(corpus_dir)
+        make_corpus(corpus_dir, args.corpus_multiplier)
+        store = ResearchVectorStore(persist_directory=os.path.join(work_dir, "chroma_db"),
+                                    embeddings=HashingEmbeddings())
+        
+        started = time.perf_counter()
+        ingest_stats = store.sync_documents(corpus_dir)
+        full_sync_seconds = time.perf_counter() - started
+        
+        started = time.perf_counter()
+        store.sync_documents(corpus_dir)
+        noop_sync_seconds = time.perf_counter() - started
+        
+        counter = {"i": 0}
+        def uncached_query():
+            # A fresh query string each time bypasses the embedding and result caches
+            counter["i"] += 1
+            store.get_context_for_company("AAPL", query=f"AAPL services revenue growth {counter['i']}")
+        
+        aspects = ["business overview", "revenue margins cash flow", "growth drivers", "risks regulation", "valuation outlook"]
+        def uncached_sections_sequential():
+            counter["i"] += 1
+            for aspect in aspects:
+                store.get_context_for_company("AAPL", query=f"AAPL {aspect} {counter['i']}")
+        
+        def uncached_sections_batched():
+            counter["i"] += 1
+            store.get_contexts_for_company("AAPL", [f"AAPL {aspect} {counter['i']}" for aspect in aspects])
+        
+        results = {
+            "ingest": ingest_stats,
+            "full_sync_seconds": full_sync_seconds,
+            "noop_sync_seconds": noop_sync_seconds,
+            "context_uncached": measure(uncached_query, args.repeat),
+            "context_memoized": measure(
+                lambda: store.get_context_for_company("AAPL", query="AAPL services revenue growth"), args.repeat
+            ),
+            "context_snapshot": measure(lambda: store.get_context_for_company("AAPL"), args.repeat),
+            "sections_context_sequential": measure(uncached_sections_sequential, args.repeat),
+            "sections_context_batched": measure(uncached_sections_batched, args.repeat),
+            "lexical_search": measure(
+                lambda: store.lexical_index.search("Q3 FY24 services revenue", "AAPL", 6), args.repeat
+            ),
+            "cache_stats": store.get_cache_stats()
+        }
+        del store
+    return results
+
+def _write_catalog(path: str, size: int):
+    sectors = ["IT", "FIN", "HEALTH", "ENERGY"]
+    report_types = ["FirstCutReport", "BuyReport", "SellReport", "HoldReport"]
+    catalog = []
+    for i in range(size):
+        catalog.append({
+            "CompanyCode": f"C{i // len(report_types):06d}",
+            "SectorCode": sectors[i % len(sectors)],
+            "ReportType": report_types[i % len(report_types)],
+            "Prompt": f"Prompt {i} for {{company_code}} in {{sector_code}}"
+        })
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(catalog, f)
+    return catalog
+
+def bench_prompts(args) -> Dict[str, Any]:
+    from prompt_registry import PromptRegistry
+    
+    results = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        for size in args.catalog_sizes:
+            path = os.path.join(work_dir, f"prompts_{size}.json")
+            catalog = _write_catalog(path, size)
+            last = catalog[-1]
+            
+            started = time.perf_counter()
+            registry = PromptRegistry(path, reload_interval=3600)
+            load_seconds = time.perf_counter() - started
+            
+            def linear_scan():
+                # The pre-registry lookup, kept as a reference point
+                for prompt_config in catalog:
+                    if (prompt_config["CompanyCode"] == last["CompanyCode"] and
+                            prompt_config["SectorCode"] == last["SectorCode"] and
+                            prompt_config["ReportType"] == last["ReportType"]):
+                        return prompt_config["Prompt"]
+            
+            results[str(size)] = {
+                "load_seconds": load_seconds,
+                "registry_hit": measure(
+                    lambda: registry.resolve(last["CompanyCode"], last["SectorCode"], last["ReportType"]),
+                    args.repeat * 100
+                ),
+                "registry_miss": measure(
+                    lambda: registry.resolve("NOPE", "NOPE", "NOPE"), args.repeat * 100
+                ),
+                "linear_scan_worst_case": measure(linear_scan, args.repeat)
+            }
+    return results
+
+def bench_graph(args) -> Dict[str, Any]:
+    from benchmarks.stubs import StubChatModel
+    from model_registry import set_chat_model
+    from graph import create_research_graph
+    
+    stub = StubChatModel(latency_ms=args.llm_latency_ms)
+    for node in ("junior_analyst", "senior_analyst"):
+        set_chat_model(node, stub)
+    
+    graph = create_research_graph()
+    context = "\n\n".join(
+        f"Context {i + 1}:\n" + ("Revenue grew 8% year over year on services strength. " * 18)
+        for i in range(10)
+    )
+    counter = {"i": 0}
+    
+    def graph_input():
+        counter["i"] += 1
+        return {
+            "messages": [("user", "Generate a comprehensive BUY report for AAPL in the IT sector.")],
+            "company_code": "AAPL",
+            "sector_code": "IT",
+            "report_type": "BuyReport",
+            "research_context": context,
+            "deadline_at": 0.0,
+            "stage_timings": {},
+            "stages_run": []
+        }, {"configurable": {"thread_id": f"bench-{counter['i']}"}}
+    
+    def run_sync():
+        state, config = graph_input()
+        graph.invoke(state, config)
+    
+    async def run_concurrent(n: int):
+        async def one():
+            state, config = graph_input()
+            await graph.ainvoke(state, config)
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(n)))
+        return time.perf_counter() - started
+    
+    concurrent_seconds = asyncio.run(run_concurrent(args.graph_concurrency))
+    return {
+        "llm_latency_ms": args.llm_latency_ms,
+        "sequential": measure(run_sync, args.repeat),
+        "concurrent": {
+            "requests": args.graph_concurrency,
+            "wall_seconds": concurrent_seconds,
+            "requests_per_second": args.graph_concurrency / concurrent_seconds if concurrent_seconds else 0.0
+        }
+    }
+
+BENCHMARKS = {
+    "chunking": bench_chunking,
+    "vector_store": bench_vector_store,
+    "prompts": bench_prompts,
+    "graph": bench_graph,
+}
+
+def _git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, text=True).strip()
+    except Exception:
+        return "unknown"
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the offline micro-benchmark suite")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="Run only these benchmarks")
+    parser.add_argument("--output", help="Write JSON results here (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed repetitions per measurement")
+    parser.add_argument("--corpus-multiplier", type=int, default=10, help="Copies of docs/ to ingest")
+    parser.add_argument("--catalog-sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--llm-latency-ms", type=float, default=20.0, help="Stub chat model latency per call")
+    parser.add_argument("--graph-concurrency", type=int, default=16)
+    args = parser.parse_args()
+    
+    # Keep every on-disk side effect (caches, checkpoints) out of the working tree
+    scratch_dir = tempfile.mkdtemp(prefix="research-bench-")
+    os.environ.setdefault("CHECKPOINT_DB_PATH", os.path.join(scratch_dir, "checkpoints.sqlite3"))
+    os.environ.setdefault("REPORT_CACHE_PATH", os.path.join(scratch_dir, "report_cache.sqlite3"))
+    # Every graph run sends the same prompt; measure the graph, not the LLM-call cache
+    os.environ.setdefault("LLM_CACHE_ENABLED", "false")
+    os.environ.setdefault("LLM_CACHE_PATH", os.path.join(scratch_dir, "llm_cache.sqlite3"))
+    os.environ.setdefault("PDF_EXPORT_DIR", os.path.join(scratch_dir, "pdf"))
+    sys.path.insert(0, REPO_ROOT)
+    
+    results = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": vars(args),
+        "benchmarks": {}
+    }
+    try:
+        for name in args.only or BENCHMARKS:
+            print(f"⏱️  Running {name} benchmark...", file=sys.stderr)
+            results["benchmarks"][name] = BENCHMARKS[name](args)
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+    
+    output = args.output or os.path.join(
+        REPO_ROOT, "benchmarks", "results", time.strftime("%Y%m%d-%H%M%S") + ".json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, default=str)
+    print(f"✅ Benchmark results written to {output}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Deterministic offline stand-ins for the chat model and the embedding model
+"""
+
+import asyncio
+import hashlib
+import math
+import re
+import time
+from typing import Any, List, Optional
+from langchain_core.callbacks import CallbackManagerForLLMRun, AsyncCallbackManagerForLLMRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+_TOKEN = re.compile(r"\w+")
+
+class StubChatModel(BaseChatModel):
+    """Chat model that sleeps for a fixed latency and returns a deterministic reply"""
+    
+    latency_ms: float = 0.0
+    response_words: int = 400
+    
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+    
+    def _reply(self, messages: List[BaseMessage]) -> ChatResult:
+        prompt = "\n".join(str(message.content) for message in messages)
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        words = [f"{digest[i % len(digest)]}{i}" for i in range(self.response_words)]
+        content = "## Stub Report\n\n" + " ".join(words)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content))])
+    
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.latency_ms / 1000.0)
+        return self._reply(messages)
+    
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self.latency_ms / 1000.0)
+        return self._reply(messages)
+
+class HashingEmbeddings(Embeddings):
+    """Feature-hashing embeddings: deterministic, dependency-free and fast"""
+    
+    def __init__(self, dimensions: int = 384):
+        self.dimensions = dimensions
+    
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimensions
+        for token in _TOKEN.findall(text.lower()):
+            digest = hashlib.md5(token.encode("utf-8")).digest()
+            index = int.from_bytes(digest[:4], "little") % self.dimensions
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+    
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
@@ -0,0 +1,310 @@
+"""
+Bounded, persistent LangGraph checkpointer
+
+Keeps only the latest checkpoint per thread, holds the most recently used threads in an
+in-memory LRU and spills the rest to SQLite. Large serialized checkpoints are compressed,
+and threads idle for longer than the TTL are evicted from both tiers.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Sequence, Tuple
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id
+)
+from langgraph.checkpoint.memory import MemorySaver
+import logging
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINTER = os.getenv("CHECKPOINTER", "bounded")
+CHECKPOINT_DB_PATH = os.getenv("CHECKPOINT_DB_PATH", "./cache/checkpoints.sqlite3")
+CHECKPOINT_MAX_THREADS = int(os.getenv("CHECKPOINT_MAX_THREADS", "1000"))
+CHECKPOINT_TTL_SECONDS = float(os.getenv("CHECKPOINT_TTL_SECONDS", str(24 * 60 * 60)))
+CHECKPOINT_COMPRESS_MIN_BYTES = int(os.getenv("CHECKPOINT_COMPRESS_MIN_BYTES", "4096"))
+CHECKPOINT_SWEEP_INTERVAL_SECONDS = 60.0
+
+COMPRESSED_PREFIX = "zlib:"
+
+class BoundedSqliteSaver(BaseCheckpointSaver):
+    """
+    Checkpointer with bounded memory: an LRU of hot threads in front of a SQLite store
+    
+    Each thread keeps only its latest checkpoint (plus that checkpoint's pending writes),
+    so per-thread storage doesn't grow with the number of steps.
+    """
+    
+    def __init__(self, db_path: str = CHECKPOINT_DB_PATH, max_threads: int = CHECKPOINT_MAX_THREADS,
+                 ttl_seconds: float = CHECKPOINT_TTL_SECONDS,
+                 compress_min_bytes: int = CHECKPOINT_COMPRESS_MIN_BYTES, **kwargs):
+        super().__init__(**kwargs)
+        self.max_threads = max_threads
+        self.ttl_seconds = ttl_seconds
+        self.compress_min_bytes = compress_min_bytes
+        self._hot: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._last_sweep = time.monotonic()
+        
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS checkpoints (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL,
+                checkpoint_id TEXT NOT NULL,
+                parent_id TEXT,
+                checkpoint_type TEXT NOT NULL,
+                checkpoint BLOB NOT NULL,
+                metadata_type TEXT NOT NULL,
+                metadata BLOB NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (thread_id, checkpoint_ns)
+            )"""
+        )
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS checkpoint_writes (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                task_id TEXT NOT NULL,
+                channel TEXT NOT NULL,
+                value_type TEXT NOT NULL,
+                value BLOB NOT NULL,
+                PRIMARY KEY (thread_id, checkpoint_ns, idx)
+            )"""
+        )
+        self._conn.commit()
+    
+    # Serialization ------------------------------------------------------
+    
+    def _dump(self, value: Any) -> Tuple[str, bytes]:
+        value_type, data = self.serde.dumps_typed(value)
+        if len(data) >= self.compress_min_bytes:
+            return COMPRESSED_PREFIX + value_type, zlib.compress(data)
+        return value_type, data
+    
+    def _load(self, typed: Tuple[str, bytes]) -> Any:
+        value_type, data = typed
+        if value_type.startswith(COMPRESSED_PREFIX):
+            value_type, data = value_type[len(COMPRESSED_PREFIX):], zlib.decompress(data)
+        return self.serde.loads_typed((value_type, data))
+    
+    @staticmethod
+    def _key(config) -> Tuple[str, str]:
+        configurable = config["configurable"]
+        return configurable["thread_id"], configurable.get("checkpoint_ns", "")
+    
+    # Tiers --------------------------------------------------------------
+    
+    def _spill(self, key: Tuple[str, str], record: Dict[str, Any]):
+        """Persist a thread's record to SQLite (caller holds the lock)"""
+        thread_id, checkpoint_ns = key
+        self._conn.execute(
+            "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (thread_id, checkpoint_ns, record["checkpoint_id"], record["parent_id"],
+             record["checkpoint"][0], record["checkpoint"][1],
+             record["metadata"][0], record["metadata"][1], record["updated_at"])
+        )
+        self._conn.execute(
+            "DELETE FROM checkpoint_writes WHERE thread_id = ? AND checkpoint_ns = ?", key
+        )
+        self._conn.executemany(
+            "INSERT INTO checkpoint_writes VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(thread_id, checkpoint_ns, idx, task_id, channel, typed[0], typed[1])
+             for idx, (task_id, channel, typed) in enumerate(record["writes"])]
+        )
+        self._conn.commit()
+    
+    def _load_cold(self, key: Tuple[str, str]) -> Optional[Dict[str, Any]]:
+        """Load a thread's record from SQLite (caller holds the lock)"""
+        row = self._conn.execute(
+            """SELECT checkpoint_id, parent_id, checkpoint_type, checkpoint, metadata_type, metadata, updated_at
+               FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?""", key
+        ).fetchone()
+        if row is None:
+            return None
+        writes = self._conn.execute(
+            """SELECT task_id, channel, value_type, value FROM checkpoint_writes
+               WHERE thread_id = ? AND checkpoint_ns = ? ORDER BY idx""", key
+        ).fetchall()
+        return {
+            "checkpoint_id": row[0],
+            "parent_id": row[1],
+            "checkpoint": (row[2], row[3]),
+            "metadata": (row[4], row[5]),
+            "updated_at": row[6],
+            "writes": [(task_id, channel, (value_type, value)) for task_id, channel, value_type, value in writes]
+        }
+    
+    def _get_record(self, key: Tuple[str, str]) -> Optional[Dict[str, Any]]:
+        """Find a thread's record, promoting it from SQLite into the hot LRU (caller holds the lock)"""
+        record = self._hot.get(key)
+        if record is None:
+            record = self._load_cold(key)
+            if record is None:
+                return None
+            self._hot[key] = record
+        if self._is_expired(record):
+            self._delete(key)
+            return None
+        self._hot.move_to_end(key)
+        self._evict_overflow()
+        return record
+    
+    def _is_expired(self, record: Dict[str, Any]) -> bool:
+        return self.ttl_seconds > 0 and time.time() - record["updated_at"] > self.ttl_seconds
+    
+    def _delete(self, key: Tuple[str, str]):
+        self._hot.pop(key, None)
+        self._conn.execute("DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?", key)
+        self._conn.execute("DELETE FROM checkpoint_writes WHERE thread_id = ? AND checkpoint_ns = ?", key)
+        self._conn.commit()
+    
+    def _evict_overflow(self):
+        """Spill least recently used threads to SQLite until the hot tier fits"""
+        while len(self._hot) > self.max_threads:
+            key, record = self._hot.popitem(last=False)
+            self._spill(key, record)
+    
+    def _maybe_sweep(self):
+        """Drop threads idle for longer than the TTL from both tiers"""
+        now = time.monotonic()
+        if self.ttl_seconds <= 0 or now - self._last_sweep < CHECKPOINT_SWEEP_INTERVAL_SECONDS:
+            return
+        self._last_sweep = now
+        cutoff = time.time() - self.ttl_seconds
+        for key in [key for key, record in self._hot.items() if record["updated_at"] < cutoff]:
+            del self._hot[key]
+        self._conn.execute(
+            """DELETE FROM checkpoint_writes WHERE (thread_id, checkpoint_ns) IN (
+                SELECT thread_id, checkpoint_ns FROM checkpoints WHERE updated_at < ?
+            )""", (cutoff,)
+        )
+        self._conn.execute("DELETE FROM checkpoints WHERE updated_at < ?", (cutoff,))
+        self._conn.commit()
+    
+    def _to_tuple(self, key: Tuple[str, str], record: Dict[str, Any]) -> CheckpointTuple:
+        thread_id, checkpoint_ns = key
+        parent_config = None
+        if record["parent_id"]:
+            parent_config = {"configurable": {
+                "thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": record["parent_id"]
+            }}
+        return CheckpointTuple(
+            config={"configurable": {
+                "thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": record["checkpoint_id"]
+            }},
+            checkpoint=self._load(record["checkpoint"]),
+            metadata=self._load(record["metadata"]),
+            parent_config=parent_config,
+            pending_writes=[(task_id, channel, self._load(typed)) for task_id, channel, typed in record["writes"]]
+        )
+    
+    # BaseCheckpointSaver API ----------------------------------------------
+    
+    def get_tuple(self, config) -> Optional[CheckpointTuple]:
+        key = self._key(config)
+        with self._lock:
+            record = self._get_record(key)
+            if record is None:
+                return None
+            # Only the latest checkpoint is kept; older checkpoint IDs have been compacted away
+            checkpoint_id = get_checkpoint_id(config)
+            if checkpoint_id and checkpoint_id != record["checkpoint_id"]:
+                return None
+            return self._to_tuple(key, record)
+    
+    def list(self, config, *, filter: Optional[Dict[str, Any]] = None, before=None,
+             limit: Optional[int] = None) -> Iterator[CheckpointTuple]:
+        with self._lock:
+            if config is not None:
+                keys = [self._key(config)]
+            else:
+                keys = list(self._hot.keys()) + [
+                    key for key in self._conn.execute("SELECT thread_id, checkpoint_ns FROM checkpoints").fetchall()
+                    if tuple(key) not in self._hot
+                ]
+            tuples = []
+            for key in keys:
+                record = self._get_record(tuple(key))
+                if record is None:
+                    continue
+                checkpoint_tuple = self._to_tuple(tuple(key), record)
+                if before is not None and checkpoint_tuple.config["configurable"]["checkpoint_id"] >= get_checkpoint_id(before):
+                    continue
+                if filter and not all(checkpoint_tuple.metadata.get(k) == v for k, v in filter.items()):
+                    continue
+                tuples.append(checkpoint_tuple)
+                if limit is not None and len(tuples) >= limit:
+                    break
+        yield from tuples
+    
+    def put(self, config, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> Dict[str, Any]:
+        key = self._key(config)
+        record = {
+            "checkpoint_id": checkpoint["id"],
+            "parent_id": config["configurable"].get("checkpoint_id"),
+            "checkpoint": self._dump(checkpoint),
+            "metadata": self._dump(metadata),
+            "updated_at": time.time(),
+            "writes": []  # writes belonged to the superseded checkpoint
+        }
+        with self._lock:
+            self._hot[key] = record
+            self._hot.move_to_end(key)
+            self._evict_overflow()
+            self._maybe_sweep()
+        return {"configurable": {
+            "thread_id": key[0], "checkpoint_ns": key[1], "checkpoint_id": checkpoint["id"]
+        }}
+    
+    def put_writes(self, config, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str = "") -> None:
+        key = self._key(config)
+        with self._lock:
+            record = self._get_record(key)
+            if record is None or record["checkpoint_id"] != get_checkpoint_id(config):
+                return
+            record["writes"].extend((task_id, channel, self._dump(value)) for channel, value in writes)
+    
+    async def aget_tuple(self, config) -> Optional[CheckpointTuple]:
+        return self.get_tuple(config)
+    
+    async def alist(self, config, *, filter: Optional[Dict[str, Any]] = None, before=None,
+                    limit: Optional[int] = None) -> AsyncIterator[CheckpointTuple]:
+        for checkpoint_tuple in self.list(config, filter=filter, before=before, limit=limit):
+            yield checkpoint_tuple
+    
+    async def aput(self, config, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+                   new_versions: ChannelVersions) -> Dict[str, Any]:
+        return self.put(config, checkpoint, metadata, new_versions)
+    
+    async def aput_writes(self, config, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str = "") -> None:
+        return self.put_writes(config, writes, task_id, task_path)
+    
+    def flush(self):
+        """Spill every hot thread to SQLite (e.g. on shutdown)"""
+        with self._lock:
+            for key, record in self._hot.items():
+                self._spill(key, record)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Sizes of the hot and cold tiers"""
+        with self._lock:
+            cold = self._conn.execute("SELECT COUNT(*) FROM checkpoints").fetchone()[0]
+            return {"hot_threads": len(self._hot), "persisted_threads": cold, "max_threads": self.max_threads}
+
+def create_checkpointer():
+    """Create the checkpointer selected by CHECKPOINTER ("bounded" or "memory")"""
+    if CHECKPOINTER == "memory":
+        return MemorySaver()
+    return BoundedSqliteSaver()
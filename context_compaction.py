@@ -0,0 +1,188 @@
+"""
+Token-budgeted compaction of the retrieved research context
+
+Retrieved chunks overlap (the splitter uses a 200-char overlap) and often repeat each
+other. Compaction runs once per request: it strips overlapping regions, orders chunks
+by MMR (relevance vs. redundancy), and each LLM node then renders the shared chunk list
+into its own token budget.
+"""
+
+import math
+import os
+import re
+import threading
+from collections import Counter
+from typing import Dict, Any, List
+from ingestion import CHUNK_OVERLAP
+
+# Per-node context token budgets; the senior prompt also carries the whole first cut
+CONTEXT_TOKEN_BUDGETS = {
+    "junior_analyst": int(os.getenv("JUNIOR_CONTEXT_TOKEN_BUDGET", "3000")),
+    "senior_analyst": int(os.getenv("SENIOR_CONTEXT_TOKEN_BUDGET", "1500")),
+    "revision": int(os.getenv("REVISION_CONTEXT_TOKEN_BUDGET", "2000")),
+}
+# Per-section context in sections mode (each section node retrieves its own chunks)
+SECTION_CONTEXT_TOKEN_BUDGET = int(os.getenv("SECTION_CONTEXT_TOKEN_BUDGET", "1200"))
+MMR_LAMBDA = float(os.getenv("CONTEXT_MMR_LAMBDA", "0.7"))
+MIN_OVERLAP_CHARS = 40
+
+_CONTEXT_HEADER = re.compile(r"(?:^|\n\n)Context \d+:\n")
+_WORD = re.compile(r"[a-z0-9$%.]+")
+
+_encoding = None
+_encoding_loaded = False
+
+def _get_encoding():
+    """Load the cl100k tokenizer on first use (None when tiktoken is unavailable)"""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = None
+        _encoding_loaded = True
+    return _encoding
+
+def count_tokens(text: str) -> int:
+    """Count tokens with the cl100k tokenizer, or approximate (~4 characters per token)"""
+    encoding = _get_encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+_stats_lock = threading.Lock()
+_stats = {"requests": 0, "original_tokens": 0, "sent_tokens": 0, "tokens_saved": 0}
+
+def split_context(context: str) -> List[str]:
+    """Split a "Context i:" formatted context string back into its chunks"""
+    if not context:
+        return []
+    parts = _CONTEXT_HEADER.split(context)
+    return [part.strip() for part in parts if part.strip()]
+
+def _strip_overlap(kept: str, chunk: str) -> str:
+    """Remove a prefix or suffix of chunk that duplicates the end or start of kept"""
+    window = CHUNK_OVERLAP * 2
+    
+    # kept's tail == chunk's head (chunk follows kept in the source document)
+    tail = kept[-window:]
+    probe = chunk[:MIN_OVERLAP_CHARS]
+    position = tail.find(probe) if len(probe) == MIN_OVERLAP_CHARS else -1
+    while position != -1:
+        overlap = tail[position:]
+        if chunk.startswith(overlap):
+            return chunk[len(overlap):]
+        position = tail.find(probe, position + 1)
+    
+    # chunk's tail == kept's head (chunk precedes kept in the source document)
+    head = kept[:window]
+    probe = head[:MIN_OVERLAP_CHARS]
+    position = chunk.find(probe, max(0, len(chunk) - window)) if len(probe) == MIN_OVERLAP_CHARS else -1
+    while position != -1:
+        overlap = chunk[position:]
+        if head.startswith(overlap) or kept.startswith(overlap):
+            return chunk[:position]
+        position = chunk.find(probe, position + 1)
+    return chunk
+
+def dedup_chunks(chunks: List[str]) -> List[str]:
+    """Drop duplicate/contained chunks and strip regions that overlap an earlier chunk"""
+    kept: List[str] = []
+    for chunk in chunks:
+        if any(chunk in other for other in kept):
+            continue
+        for other in kept:
+            chunk = _strip_overlap(other, chunk).strip()
+            if not chunk:
+                break
+        if len(chunk) >= MIN_OVERLAP_CHARS:
+            kept.append(chunk)
+    return kept
+
+def _term_vector(text: str) -> Counter:
+    return Counter(_WORD.findall(text.lower()))
+
+def _cosine(a: Counter, b: Counter) -> float:
+    if not a or not b:
+        return 0.0
+    dot = sum(count * b.get(term, 0) for term, count in a.items())
+    norm = math.sqrt(sum(v * v for v in a.values())) * math.sqrt(sum(v * v for v in b.values()))
+    return dot / norm if norm else 0.0
+
+def mmr_order(chunks: List[str], query: str, lambda_mult: float = MMR_LAMBDA) -> List[str]:
+    """
+    Order chunks by maximal marginal relevance
+    
+    Relevance blends the retrieval rank with lexical similarity to the query; redundancy
+    is the highest lexical similarity to an already selected chunk.
+    """
+    if len(chunks) < 2:
+        return list(chunks)
+    
+    vectors = [_term_vector(chunk) for chunk in chunks]
+    query_vector = _term_vector(query)
+    relevance = [
+        0.5 * (1.0 - i / len(chunks)) + 0.5 * _cosine(query_vector, vector)
+        for i, vector in enumerate(vectors)
+    ]
+    
+    selected: List[int] = []
+    remaining = list(range(len(chunks)))
+    while remaining:
+        def score(i):
+            redundancy = max((_cosine(vectors[i], vectors[j]) for j in selected), default=0.0)
+            return lambda_mult * relevance[i] - (1 - lambda_mult) * redundancy
+        best = max(remaining, key=score)
+        selected.append(best)
+        remaining.remove(best)
+    return [chunks[i] for i in selected]
+
+def render_context(chunks: List[str], budget: int) -> str:
+    """Render the highest-ranked chunks that fit within the token budget"""
+    parts = []
+    used = 0
+    for chunk in chunks:
+        part = f"Context {len(parts) + 1}:\n{chunk}"
+        tokens = count_tokens(part) + 2
+        if used + tokens > budget:
+            continue
+        parts.append(part)
+        used += tokens
+    return "\n\n".join(parts)
+
+def compact_context(context: str, query: str = "") -> Dict[str, Any]:
+    """
+    Compact a retrieved context once per request
+    
+    Returns the shared, ranked chunk list plus token metrics: the tokens the original
+    context would have cost across all LLM calls vs. what each node's budget renders.
+    """
+    chunks = mmr_order(dedup_chunks(split_context(context)), query)
+    original_tokens = count_tokens(context)
+    node_tokens = {
+        node: count_tokens(render_context(chunks, budget))
+        for node, budget in CONTEXT_TOKEN_BUDGETS.items()
+    }
+    original_total = original_tokens * len(CONTEXT_TOKEN_BUDGETS)
+    sent_total = sum(node_tokens.values())
+    metrics = {
+        "original_tokens": original_tokens,
+        "node_tokens": node_tokens,
+        "tokens_saved": max(0, original_total - sent_total)
+    }
+    
+    with _stats_lock:
+        _stats["requests"] += 1
+        _stats["original_tokens"] += original_total
+        _stats["sent_tokens"] += sent_total
+        _stats["tokens_saved"] += metrics["tokens_saved"]
+    
+    return {"chunks": chunks, "metrics": metrics}
+
+def get_compaction_stats() -> Dict[str, Any]:
+    """Cumulative context tokens saved by compaction"""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["tokenizer"] = "cl100k_base" if _get_encoding() is not None else "approximate"
+    return stats
@@ -0,0 +1,106 @@
+"""
+Pluggable CPU embedding backends for all-MiniLM-L6-v2
+
+    torch      - sentence-transformers on PyTorch (the reference)
+    onnx       - sentence-transformers on ONNX Runtime
+    onnx-int8  - ONNX Runtime with the dynamically quantized int8 export
+
+The ONNX backends need `pip install "sentence-transformers[onnx]"`.
+"""
+
+import math
+import os
+import threading
+from typing import Dict, List, Optional
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))  # 0 = library default
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+# Quantized exports shipped in the model repo: model_qint8_avx512_vnni.onnx, model_qint8_avx2.onnx, ...
+EMBEDDING_ONNX_INT8_FILE = os.getenv("EMBEDDING_ONNX_INT8_FILE", "onnx/model_qint8_avx2.onnx")
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+class SentenceTransformerBackendEmbeddings(Embeddings):
+    """LangChain embeddings over a sentence-transformers model on the selected runtime"""
+    
+    def __init__(self, backend: str = EMBEDDING_BACKEND, model_name: str = EMBEDDING_MODEL,
+                 threads: int = EMBEDDING_THREADS, batch_size: int = EMBEDDING_BATCH_SIZE):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown embedding backend '{backend}', expected one of {BACKENDS}")
+        from sentence_transformers import SentenceTransformer
+        
+        self.backend = backend
+        self.model_name = model_name
+        self.batch_size = batch_size
+        
+        if backend == "torch":
+            if threads:
+                import torch
+                torch.set_num_threads(threads)
+            self.model = SentenceTransformer(model_name, device="cpu")
+        else:
+            model_kwargs = {"provider": "CPUExecutionProvider"}
+            if threads:
+                import onnxruntime
+                session_options = onnxruntime.SessionOptions()
+                session_options.intra_op_num_threads = threads
+                session_options.inter_op_num_threads = 1
+                model_kwargs["session_options"] = session_options
+            if backend == "onnx-int8":
+                model_kwargs["file_name"] = EMBEDDING_ONNX_INT8_FILE
+            self.model = SentenceTransformer(model_name, device="cpu", backend="onnx", model_kwargs=model_kwargs)
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        texts = [text.replace("\n", " ") for text in texts]
+        return self.model.encode(texts, batch_size=self.batch_size, convert_to_numpy=True).tolist()
+    
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+def create_embeddings(backend: Optional[str] = None) -> Embeddings:
+    """Create the embedding backend selected by EMBEDDING_BACKEND (or the given name)"""
+    return SentenceTransformerBackendEmbeddings(backend=backend or EMBEDDING_BACKEND)
+
+# One model per process; under the preload-then-fork launcher the master loads it and the
+# forked workers share the weight pages copy-on-write
+_shared_embeddings: Optional[Embeddings] = None
+_shared_embeddings_lock = threading.Lock()
+
+def get_shared_embeddings() -> Embeddings:
+    """Get or create this process's embedding model"""
+    global _shared_embeddings
+    if _shared_embeddings is None:
+        with _shared_embeddings_lock:
+            if _shared_embeddings is None:
+                _shared_embeddings = create_embeddings()
+    return _shared_embeddings
+
+def preload_embeddings() -> Embeddings:
+    """
+    Load the model weights before forking workers
+    
+    Deliberately runs no inference: that would start the torch/ORT thread pools,
+    which do not survive fork.
+    """
+    return get_shared_embeddings()
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+def check_parity(candidate: Embeddings, reference: Embeddings, texts: List[str]) -> Dict[str, float]:
+    """Report cosine similarity/drift of candidate embeddings against the reference backend"""
+    similarities = [
+        _cosine(a, b)
+        for a, b in zip(candidate.embed_documents(texts), reference.embed_documents(texts))
+    ]
+    return {
+        "texts": len(texts),
+        "mean_cosine": sum(similarities) / len(similarities) if similarities else 0.0,
+        "min_cosine": min(similarities, default=0.0),
+        "max_drift": 1.0 - min(similarities, default=1.0)
+    }
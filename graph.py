@@ -1,12 +1,29 @@
-from langgraph.graph import StateGraph, MessagesState, START, END
-from langgraph.prebuilt import ToolNode
-from langchain_core.tools import tool
-from langchain.chat_models import init_chat_model
+from langgraph.graph import StateGraph, START, END
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
-from langgraph.checkpoint.memory import MemorySaver
+from langchain_core.runnables import RunnableLambda
+from checkpointer import create_checkpointer
 from vector_store import get_research_vectorstore
+from model_registry import get_chat_model, get_node_model_config
+from context_compaction import (
+    compact_context,
+    render_context,
+    count_tokens,
+    split_context,
+    dedup_chunks,
+    mmr_order,
+    CONTEXT_TOKEN_BUDGETS,
+    SECTION_CONTEXT_TOKEN_BUDGET
+)
+from metrics import get_logger, record_llm_call, NODE_SECONDS
+from llm_cache import get_llm_cache, LLM_CACHE_ENABLED
 from typing import TypedDict, Annotated
+import asyncio
+import os
 import re
+import threading
+import time
+
+logger = get_logger(__name__)
 
 # Enhanced state to track the workflow progress
 class ResearchState(TypedDict):
@@ -15,10 +32,15 @@ class ResearchState(TypedDict):
     sector_code: str
     report_type: str
     research_context: str
+    context_chunks: list
+    context_metrics: dict
     first_cut_report: str
     feedback: str
     final_report: str
     analyst_iterations: int
+    deadline_at: float  # epoch seconds; 0 means no deadline
+    stage_timings: dict
+    stages_run: list
 
 def initialize_research(state):
     """Initialize the research process by getting context from ChromaDB"""
@@ -27,16 +49,23 @@ def initialize_research(state):
     sector_code = state.get("sector_code", "")
     report_type = state.get("report_type", "")
     
-    print(f"DEBUG: initialize_research - Company: {company_code}, Sector: {sector_code}, Report: {report_type}")
+    logger.debug("initialize_research - Company: %s, Sector: %s, Report: %s", company_code, sector_code, report_type)
     
-    # Get relevant context from ChromaDB
-    vectorstore = get_research_vectorstore()
-    context = ""
+    # Context may be pre-fetched by the caller (e.g. shared across a batch)
+    context = state.get("research_context", "")
     
-    if company_code and company_code != "UNKNOWN":
-        print(f"DEBUG: Retrieving context for company: {company_code}")
+    if context:
+        logger.debug("Using pre-fetched context (%d characters)", len(context))
+    elif company_code and company_code != "UNKNOWN":
+        # Get relevant context from ChromaDB
+        vectorstore = get_research_vectorstore()
+        logger.debug("Retrieving context for company: %s", company_code)
         context = vectorstore.get_context_for_company(company_code)
-        print(f"DEBUG: Retrieved context length: {len(context)} characters")
+        logger.debug("Retrieved context length: %d characters", len(context))
+    
+    # Compact once; every LLM node renders this shared chunk list into its own token budget
+    compacted = compact_context(context, _extract_user_request(messages))
+    logger.debug("Context compaction - %s", compacted["metrics"])
     
     return {
         "messages": messages,
@@ -44,32 +73,97 @@ def initialize_research(state):
         "sector_code": sector_code,
         "report_type": report_type,
         "research_context": context,
+        "context_chunks": compacted["chunks"],
+        "context_metrics": compacted["metrics"],
         "first_cut_report": "",
         "feedback": "",
         "final_report": "",
         "analyst_iterations": 0
     }
 
-def equity_research_analyst(state):
-    """Junior Equity Research Analyst - generates reports using RAG context"""
-    messages = state["messages"]
-    company_code = state.get("company_code", "")
-    context = state.get("research_context", "")
-    feedback = state.get("feedback", "")
-    iterations = state.get("analyst_iterations", 0)
-    
-    print(f"DEBUG: Equity Research Analyst - Iteration {iterations + 1}")
-    
-    # Extract user message content (handle both tuple and message object formats)
+def _extract_user_request(messages) -> str:
+    """Extract user message content (handle both tuple and message object formats)"""
     user_request = ""
     if messages and len(messages) > 0:
         if isinstance(messages[0], tuple):
             user_request = messages[0][1]  # For ("user", content) format
         else:
             user_request = messages[0].content  # For message object format
+    return user_request
+
+def _usage_tokens(response, model_messages):
+    """Prompt/completion token counts from provider usage metadata, else counted locally"""
+    usage = getattr(response, "usage_metadata", None) or {}
+    prompt_tokens = usage.get("input_tokens") or sum(count_tokens(str(m.content)) for m in model_messages)
+    completion_tokens = usage.get("output_tokens") or count_tokens(str(response.content))
+    return prompt_tokens, completion_tokens
+
+def _cache_subject(state, section: str = "") -> str:
+    """LLM-cache subject of a prompt: completions are only reused for the same company, sector, report type and section"""
+    return "|".join([state.get("company_code", ""), state.get("sector_code", ""), state.get("report_type", ""), section])
+
+def _call_model(node: str, model_messages, subject: str = ""):
+    """Invoke a node's chat model (through the LLM-call cache), streaming so time to first token can be recorded"""
+    model_name, temperature = get_node_model_config(node)
+    if LLM_CACHE_ENABLED:
+        cached, handle = get_llm_cache().lookup(node, model_name, temperature, model_messages, subject)
+        if cached is not None:
+            return AIMessage(content=cached)
+    
+    model = get_chat_model(node)
+    started = time.perf_counter()
+    first_token_at = None
+    response = None
+    for chunk in model.stream(model_messages):
+        if first_token_at is None:
+            first_token_at = time.perf_counter()
+        response = chunk if response is None else response + chunk
+    record_llm_call(node, model_name, started, first_token_at,
+                    *_usage_tokens(response, model_messages))
+    if LLM_CACHE_ENABLED:
+        get_llm_cache().store(handle, response.content)
+    return response
+
+async def _acall_model(node: str, model_messages, subject: str = ""):
+    """Async variant of _call_model; cache lookups (SQLite, embeddings) run off the event loop"""
+    model_name, temperature = get_node_model_config(node)
+    if LLM_CACHE_ENABLED:
+        cached, handle = await asyncio.to_thread(
+            get_llm_cache().lookup, node, model_name, temperature, model_messages, subject
+        )
+        if cached is not None:
+            return AIMessage(content=cached)
+    
+    model = get_chat_model(node)
+    started = time.perf_counter()
+    first_token_at = None
+    response = None
+    async for chunk in model.astream(model_messages):
+        if first_token_at is None:
+            first_token_at = time.perf_counter()
+        response = chunk if response is None else response + chunk
+    record_llm_call(node, model_name, started, first_token_at,
+                    *_usage_tokens(response, model_messages))
+    if LLM_CACHE_ENABLED:
+        await asyncio.to_thread(get_llm_cache().store, handle, response.content)
+    return response
+
+def _node_context(state, budget_name: str) -> str:
+    """Render the shared compacted context within a node's token budget"""
+    chunks = state.get("context_chunks")
+    if not chunks:
+        return state.get("research_context", "")
+    return render_context(chunks, CONTEXT_TOKEN_BUDGETS[budget_name])
+
+def _build_analyst_messages(state):
+    """Build the junior analyst prompt; returns (model messages, is_final_report)"""
+    feedback = state.get("feedback", "")
+    iterations = state.get("analyst_iterations", 0)
+    user_request = _extract_user_request(state["messages"])
     
     # Determine if this is first cut or final report
-    is_final_report = iterations > 0 and feedback
+    is_final_report = bool(iterations > 0 and feedback)
+    context = _node_context(state, "revision" if is_final_report else "junior_analyst")
     
     if is_final_report:
         system_content = f"""You are a Junior Equity Research Analyst. You are revising your research report based on senior analyst feedback.
@@ -113,52 +207,58 @@ Use professional formatting with clear sections, bullet points, and actionable i
 Base your analysis on the research context provided above.
 """
     
-    system_message = SystemMessage(content=system_content)
-    model = init_chat_model("groq:llama3-8b-8192", temperature=0.7)
-    
     # Create proper message for the model
-    user_message = HumanMessage(content=user_request)
-    response = model.invoke([system_message, user_message])
-    report_content = response.content
-    
+    model_messages = [SystemMessage(content=system_content), HumanMessage(content=user_request)]
+    return model_messages, is_final_report
+
+def _analyst_state_update(state, report_content: str, is_final_report: bool):
+    """Build the state update returned by the junior analyst node"""
     updated_state = {
         "messages": state["messages"],
-        "company_code": company_code,
+        "company_code": state.get("company_code", ""),
         "sector_code": state.get("sector_code", ""),
         "report_type": state.get("report_type", ""),
-        "research_context": context,
-        "analyst_iterations": iterations + 1
+        "research_context": state.get("research_context", ""),
+        "analyst_iterations": state.get("analyst_iterations", 0) + 1
     }
     
     if is_final_report:
-        print(f"DEBUG: Generated FINAL report")
+        logger.debug("Generated FINAL report")
         updated_state["final_report"] = report_content
         updated_state["first_cut_report"] = state.get("first_cut_report", "")
-        updated_state["feedback"] = feedback
+        updated_state["feedback"] = state.get("feedback", "")
     else:
-        print(f"DEBUG: Generated FIRST CUT report")
+        logger.debug("Generated FIRST CUT report")
         updated_state["first_cut_report"] = report_content
         updated_state["feedback"] = ""
         updated_state["final_report"] = ""
     
     return updated_state
 
-def senior_equity_research_analyst(state):
-    """Senior Equity Research Analyst - reviews and provides feedback"""
-    first_cut_report = state.get("first_cut_report", "")
-    company_code = state.get("company_code", "")
-    context = state.get("research_context", "")
-    messages = state["messages"]
+def equity_research_analyst(state):
+    """Junior Equity Research Analyst - generates reports using RAG context"""
+    logger.debug("Equity Research Analyst - Iteration %d", state.get("analyst_iterations", 0) + 1)
     
-    print(f"DEBUG: Senior Equity Research Analyst - Reviewing first cut report")
+    model_messages, is_final_report = _build_analyst_messages(state)
+    response = _call_model("junior_analyst", model_messages, _cache_subject(state))
     
-    # Extract user message content (handle both tuple and message object formats)
-    user_request = ""
-    if messages and len(messages) > 0:
-        if isinstance(messages[0], tuple):
-            user_request = messages[0][1]  # For ("user", content) format
-        else:
-            user_request = messages[0].content  # For message object format
+    return _analyst_state_update(state, response.content, is_final_report)
+
+async def aequity_research_analyst(state):
+    """Async Junior Equity Research Analyst - awaits the LLM so the event loop stays free"""
+    logger.debug("Equity Research Analyst (async) - Iteration %d", state.get("analyst_iterations", 0) + 1)
+    
+    model_messages, is_final_report = _build_analyst_messages(state)
+    response = await _acall_model("junior_analyst", model_messages, _cache_subject(state))
+    
+    return _analyst_state_update(state, response.content, is_final_report)
+
+def _build_senior_messages(state):
+    """Build the senior analyst review prompt"""
+    first_cut_report = state.get("first_cut_report", "")
+    company_code = state.get("company_code", "")
+    context = _node_context(state, "senior_analyst")
+    user_request = _extract_user_request(state["messages"])
     
     system_content = f"""You are a Senior Equity Research Analyst with 15+ years of experience. 
 Your role is to review the junior analyst's first-cut report and provide constructive feedback.
@@ -191,31 +291,132 @@ Be specific about what needs to be corrected, enhanced, or added.
 Provide actionable suggestions for improvement.
 """
     
-    system_message = SystemMessage(content=system_content)
-    model = init_chat_model("groq:llama3-8b-8192", temperature=0.3)  # Lower temperature for more consistent feedback
-    
-    response = model.invoke([system_message])
-    feedback_content = response.content
-    
-    print(f"DEBUG: Generated feedback for first cut report")
+    return [SystemMessage(content=system_content)]
+
+def _senior_state_update(state, feedback_content: str):
+    """Build the state update returned by the senior analyst node"""
+    logger.debug("Generated feedback for first cut report")
     
     return {
         "messages": state["messages"],
-        "company_code": company_code,
+        "company_code": state.get("company_code", ""),
         "sector_code": state.get("sector_code", ""),
         "report_type": state.get("report_type", ""),
-        "research_context": context,
-        "first_cut_report": first_cut_report,
+        "research_context": state.get("research_context", ""),
+        "first_cut_report": state.get("first_cut_report", ""),
         "feedback": feedback_content,
         "final_report": "",
         "analyst_iterations": state.get("analyst_iterations", 0)
     }
 
+def senior_equity_research_analyst(state):
+    """Senior Equity Research Analyst - reviews and provides feedback"""
+    logger.debug("Senior Equity Research Analyst - Reviewing first cut report")
+    
+    response = _call_model("senior_analyst", _build_senior_messages(state), _cache_subject(state))
+    
+    return _senior_state_update(state, response.content)
+
+async def asenior_equity_research_analyst(state):
+    """Async Senior Equity Research Analyst - awaits the LLM so the event loop stays free"""
+    logger.debug("Senior Equity Research Analyst (async) - Reviewing first cut report")
+    
+    response = await _acall_model("senior_analyst", _build_senior_messages(state), _cache_subject(state))
+    
+    return _senior_state_update(state, response.content)
+
+# Deadline scheduling: every node records its elapsed time, and the routing functions
+# skip the senior review/revision when the remaining budget can't fit them
+STAGE_ESTIMATE_ALPHA = 0.3
+_stage_estimates = {}
+_stage_estimates_lock = threading.Lock()
+
+def _record_stage_time(stage: str, elapsed: float):
+    """Fold a stage's elapsed time into its moving-average estimate"""
+    with _stage_estimates_lock:
+        previous = _stage_estimates.get(stage)
+        _stage_estimates[stage] = elapsed if previous is None else (
+            STAGE_ESTIMATE_ALPHA * elapsed + (1 - STAGE_ESTIMATE_ALPHA) * previous
+        )
+
+def estimate_stage_seconds(stage: str, fallback: float) -> float:
+    """Expected duration of a stage, falling back to e.g. this request's first-cut time"""
+    with _stage_estimates_lock:
+        return _stage_estimates.get(stage, fallback)
+
+def _remaining_seconds(state):
+    deadline_at = state.get("deadline_at") or 0
+    return deadline_at - time.time() if deadline_at else None
+
+def _stage_name(node: str, state) -> str:
+    if node == "junior_analyst":
+        return "first_cut" if state.get("analyst_iterations", 0) == 0 else "revision"
+    if node == "senior_analyst":
+        return "senior_review"
+    return node
+
+def _scheduled_node(node: str, func, afunc=None, stage: str = None, label: str = None, reduced: bool = False):
+    """
+    Wrap a node so it appends its stage to stages_run and records its elapsed time
+    
+    stage overrides the stage used for estimates/metrics and label the entry recorded in
+    stages_run. With reduced=True only this node's entries are returned, for states whose
+    stages_run/stage_timings have reducers (nodes running in parallel). A node that
+    returns None was skipped and records nothing.
+    """
+    def record(state, result, started):
+        if result is None:
+            return {}
+        elapsed = time.perf_counter() - started
+        stage_name = stage or _stage_name(node, state)
+        entry = label or stage_name
+        _record_stage_time(stage_name, elapsed)
+        NODE_SECONDS.observe(elapsed, stage=stage_name)
+        result = dict(result)
+        if reduced:
+            result["stages_run"] = [entry]
+            result["stage_timings"] = {entry: round(elapsed, 3)}
+        else:
+            result["stages_run"] = list(state.get("stages_run") or []) + [entry]
+            result["stage_timings"] = {**(state.get("stage_timings") or {}), entry: round(elapsed, 3)}
+        return result
+    
+    def run(state):
+        started = time.perf_counter()
+        return record(state, func(state), started)
+    
+    async def arun(state):
+        started = time.perf_counter()
+        return record(state, await afunc(state), started)
+    
+    # Named apart from the graph node so stream events carrying the node's name come only from the node step
+    return RunnableLambda(run, afunc=arun if afunc else None, name=f"{node}:run")
+
 def should_continue_to_senior(state):
     """Determine if we should go to senior analyst (after first cut)"""
     iterations = state.get("analyst_iterations", 0)
-    return "senior_analyst" if iterations == 1 else "finalize"
+    if iterations != 1:
+        return "finalize"
+    
+    remaining = _remaining_seconds(state)
+    if remaining is not None:
+        first_cut = (state.get("stage_timings") or {}).get("first_cut", 0.0)
+        needed = estimate_stage_seconds("senior_review", first_cut) + estimate_stage_seconds("revision", first_cut)
+        if remaining < needed:
+            logger.debug("Skipping senior review - %.1fs left, review needs ~%.1fs", remaining, needed)
+            return "finalize"
+    return "senior_analyst"
 
+def should_revise(state):
+    """Determine if the revision still fits the deadline after senior review"""
+    remaining = _remaining_seconds(state)
+    if remaining is not None:
+        first_cut = (state.get("stage_timings") or {}).get("first_cut", 0.0)
+        needed = estimate_stage_seconds("revision", first_cut)
+        if remaining < needed:
+            logger.debug("Skipping revision - %.1fs left, revision needs ~%.1fs", remaining, needed)
+            return "finalize"
+    return "junior_analyst"
 
 def finalize_research(state):
     """Finalize the research process and return the appropriate report"""
@@ -225,23 +426,29 @@ def finalize_research(state):
     # Return the final report if available, otherwise the first cut
     report_to_return = final_report if final_report else first_cut_report
     
-    print(f"DEBUG: Finalizing research - returning {'final' if final_report else 'first cut'} report")
+    logger.debug("Finalizing research - returning %s report", "final" if final_report else "first cut")
     
     return {
         "messages": [AIMessage(content=report_to_return)]
     }
 
-def create_research_graph():
+def create_research_graph(checkpointer=None):
     """Create and return the multi-agent research graph."""
     
     # Create the state graph with custom ResearchState
     workflow = StateGraph(ResearchState)
     
-    # Add nodes for the workflow
-    workflow.add_node("initialize", initialize_research)
-    workflow.add_node("junior_analyst", equity_research_analyst)
-    workflow.add_node("senior_analyst", senior_equity_research_analyst)
-    workflow.add_node("finalize", finalize_research)
+    # Add nodes for the workflow; each is wrapped so the deadline scheduler sees its timing.
+    # LLM nodes carry both a sync and an async implementation so the graph can be
+    # driven with stream()/invoke() as well as astream()/astream_events()
+    workflow.add_node("initialize", _scheduled_node("initialize", initialize_research))
+    workflow.add_node("junior_analyst", _scheduled_node(
+        "junior_analyst", equity_research_analyst, aequity_research_analyst
+    ))
+    workflow.add_node("senior_analyst", _scheduled_node(
+        "senior_analyst", senior_equity_research_analyst, asenior_equity_research_analyst
+    ))
+    workflow.add_node("finalize", _scheduled_node("finalize", finalize_research))
     
     # Define the workflow edges
     workflow.add_edge(START, "initialize")
@@ -258,15 +465,297 @@ def create_research_graph():
     )
     
     # After senior analyst feedback, go back to junior analyst for final report
-    workflow.add_edge("senior_analyst", "junior_analyst")
+    # (unless the deadline no longer leaves room for the revision)
+    workflow.add_conditional_edges(
+        "senior_analyst",
+        should_revise,
+        {
+            "junior_analyst": "junior_analyst",
+            "finalize": "finalize"
+        }
+    )
     
     # End the workflow after finalization
     workflow.add_edge("finalize", END)
     
-    # Add memory
-    memory = MemorySaver()
+    # Add memory: a bounded LRU of hot threads spilling to SQLite (see checkpointer.py)
+    memory = checkpointer or create_checkpointer()
     
     # Compile the graph
     app = workflow.compile(checkpointer=memory)
     
     return app
+
+# Sections mode --------------------------------------------------------------
+# Every section's context is retrieved in one batch up front, one junior node per report
+# section then runs in parallel on its own context, an optional per-section senior
+# review/revision runs in parallel too, and the executive summary is written last from
+# the finished sections. Latency is about one section, not six.
+
+# (key, heading, retrieval query terms); the executive summary is written by the merge node
+REPORT_SECTIONS = [
+    ("company_overview", "Company Overview", "business overview products segments market position"),
+    ("financial_analysis", "Financial Analysis", "revenue earnings margins cash flow guidance quarterly results"),
+    ("investment_thesis", "Investment Thesis", "growth drivers competitive advantages catalysts"),
+    ("risks", "Risks and Considerations", "risks competition regulation headwinds"),
+    ("recommendation", "Recommendation", "valuation price target outlook rating"),
+]
+SECTION_CONTEXT_K = int(os.getenv("SECTION_CONTEXT_K", "4"))
+SECTION_REVIEW_ENABLED = os.getenv("SECTION_REVIEW_ENABLED", "true").lower() == "true"
+
+def _merge_dict(left, right):
+    """Reducer for dicts written by parallel nodes; None resets (new request on a reused thread)"""
+    if right is None:
+        return {}
+    return {**(left or {}), **right}
+
+def _append_list(left, right):
+    """Reducer for lists appended to by parallel nodes; None resets"""
+    if right is None:
+        return []
+    return list(left or []) + list(right)
+
+class SectionsResearchState(TypedDict):
+    messages: Annotated[list, "The conversation messages"]
+    company_code: str
+    sector_code: str
+    report_type: str
+    research_context: str
+    context_chunks: list
+    context_metrics: dict
+    final_report: str
+    deadline_at: float  # epoch seconds; 0 means no deadline
+    review_sections: bool
+    sections: Annotated[dict, _merge_dict]  # section key -> text
+    section_contexts: Annotated[dict, _merge_dict]  # section key -> rendered context
+    section_feedback: Annotated[dict, _merge_dict]  # section key -> senior feedback
+    stage_timings: Annotated[dict, _merge_dict]
+    stages_run: Annotated[list, _append_list]
+
+def initialize_sections(state):
+    """
+    Initialize a sections-mode run: shared context for the summary, fresh section slots
+    and every section's context, retrieved in one batch
+    """
+    initialized = initialize_research(state)
+    return {
+        "messages": initialized["messages"],
+        "research_context": initialized["research_context"],
+        "context_chunks": initialized["context_chunks"],
+        "context_metrics": initialized["context_metrics"],
+        "final_report": "",
+        "review_sections": False,
+        "sections": None,
+        # Every section key is written, so nothing from a reused thread survives the merge
+        "section_contexts": _section_contexts({**state, **initialized}),
+        "section_feedback": None
+    }
+
+def _section_contexts(state) -> dict:
+    """Retrieve and compact the context of every section with one batched retrieval"""
+    company_code = state.get("company_code", "")
+    if not company_code or company_code == "UNKNOWN":
+        context = _node_context(state, "junior_analyst")
+        return {key: context for key, _, _ in REPORT_SECTIONS}
+    queries = [f"{company_code} {query_terms}" for _, _, query_terms in REPORT_SECTIONS]
+    contexts = get_research_vectorstore().get_contexts_for_company(company_code, queries, k=SECTION_CONTEXT_K)
+    return {
+        key: render_context(mmr_order(dedup_chunks(split_context(context)), query), SECTION_CONTEXT_TOKEN_BUDGET)
+        for (key, _, _), query, context in zip(REPORT_SECTIONS, queries, contexts)
+    }
+
+def _build_section_messages(state, title: str, context: str):
+    """Build the junior analyst prompt for a single section"""
+    user_request = _extract_user_request(state["messages"])
+    system_content = f"""You are a Junior Equity Research Analyst writing one section of an equity research report.
+
+USER REQUEST:
+{user_request}
+
+SECTION TO WRITE: {title}
+
+RESEARCH CONTEXT:
+=== RESEARCH CONTEXT ===
+{context}
+=== END CONTEXT ===
+
+Write only the "{title}" section, without a heading; other analysts are writing the remaining sections.
+Use professional formatting with bullet points and actionable insights.
+Base your analysis on the research context provided above.
+"""
+    return [SystemMessage(content=system_content), HumanMessage(content=user_request)]
+
+def _build_section_review_messages(state, key: str, title: str):
+    """Build the senior analyst review prompt for a single section"""
+    user_request = _extract_user_request(state["messages"])
+    system_content = f"""You are a Senior Equity Research Analyst reviewing the "{title}" section of a junior analyst's report for {state.get("company_code", "")}.
+
+ORIGINAL USER REQUEST:
+{user_request}
+
+RESEARCH CONTEXT:
+=== RESEARCH CONTEXT ===
+{state["section_contexts"].get(key, "")}
+=== END CONTEXT ===
+
+SECTION TO REVIEW:
+=== SECTION ===
+{state["sections"].get(key, "")}
+=== END SECTION ===
+
+Provide specific, actionable feedback on accuracy, use of the research context and missing information.
+"""
+    return [SystemMessage(content=system_content)]
+
+def _build_section_revision_messages(state, key: str, title: str, feedback: str):
+    """Build the junior analyst revision prompt for a single section"""
+    user_request = _extract_user_request(state["messages"])
+    system_content = f"""You are a Junior Equity Research Analyst revising the "{title}" section of your report based on senior analyst feedback.
+
+ORIGINAL USER REQUEST:
+{user_request}
+
+SENIOR ANALYST FEEDBACK:
+{feedback}
+
+RESEARCH CONTEXT:
+=== RESEARCH CONTEXT ===
+{state["section_contexts"].get(key, "")}
+=== END CONTEXT ===
+
+YOUR DRAFT:
+=== SECTION ===
+{state["sections"].get(key, "")}
+=== END SECTION ===
+
+Rewrite only the "{title}" section, without a heading, addressing every point of the feedback.
+"""
+    return [SystemMessage(content=system_content), HumanMessage(content=user_request)]
+
+def _section_writer(key: str, title: str):
+    """Sync and async node functions drafting one section from its pre-fetched context"""
+    def write(state):
+        context = state["section_contexts"].get(key, "")
+        response = _call_model("junior_analyst", _build_section_messages(state, title, context), _cache_subject(state, key))
+        return {"sections": {key: response.content}}
+    
+    async def awrite(state):
+        context = state["section_contexts"].get(key, "")
+        response = await _acall_model("junior_analyst", _build_section_messages(state, title, context),
+                                      _cache_subject(state, key))
+        return {"sections": {key: response.content}}
+    
+    return write, awrite
+
+def _section_reviewer(key: str, title: str):
+    """Sync and async node functions reviewing then revising one section (None when skipped)"""
+    def review(state):
+        if not state.get("review_sections") or not state["sections"].get(key):
+            return None
+        subject = _cache_subject(state, key)
+        feedback = _call_model("senior_analyst", _build_section_review_messages(state, key, title), subject).content
+        revised = _call_model("junior_analyst", _build_section_revision_messages(state, key, title, feedback), subject).content
+        return {"sections": {key: revised}, "section_feedback": {key: feedback}}
+    
+    async def areview(state):
+        if not state.get("review_sections") or not state["sections"].get(key):
+            return None
+        subject = _cache_subject(state, key)
+        feedback = (await _acall_model("senior_analyst", _build_section_review_messages(state, key, title), subject)).content
+        revised = (await _acall_model("junior_analyst", _build_section_revision_messages(state, key, title, feedback),
+                                      subject)).content
+        return {"sections": {key: revised}, "section_feedback": {key: feedback}}
+    
+    return review, areview
+
+def plan_section_review(state):
+    """
+    Join point after the drafts: review sections only if the deadline leaves room
+    
+    A deadline skip is recorded as the section_review_skipped stage, which marks the run
+    degraded; review turned off with SECTION_REVIEW_ENABLED is not.
+    """
+    if not SECTION_REVIEW_ENABLED:
+        return {"review_sections": False}
+    remaining = _remaining_seconds(state)
+    if remaining is not None:
+        timings = state.get("stage_timings") or {}
+        draft = max((elapsed for entry, elapsed in timings.items() if entry.startswith("section_draft")), default=0.0)
+        needed = estimate_stage_seconds("section_review", 2 * draft) + estimate_stage_seconds("summary", draft)
+        if remaining < needed:
+            logger.debug("Skipping section review - %.1fs left, review needs ~%.1fs", remaining, needed)
+            return {"review_sections": False, "stages_run": ["section_review_skipped"]}
+    return {"review_sections": True}
+
+def _assemble_sections(state) -> str:
+    sections = state.get("sections") or {}
+    return "\n\n".join(
+        f"## {title}\n\n{sections[key].strip()}"
+        for key, title, _ in REPORT_SECTIONS if sections.get(key)
+    )
+
+def _build_summary_messages(state, body: str):
+    """Build the prompt for the executive summary, written from the finished sections"""
+    user_request = _extract_user_request(state["messages"])
+    system_content = f"""You are a Junior Equity Research Analyst. Every section of the research report below is finished; write its Executive Summary.
+
+USER REQUEST:
+{user_request}
+
+=== REPORT SECTIONS ===
+{body}
+=== END SECTIONS ===
+
+Write only the Executive Summary, without a heading: the key findings and the recommendation, consistent with the sections above.
+"""
+    return [SystemMessage(content=system_content), HumanMessage(content=user_request)]
+
+def _merged_report(summary: str, body: str) -> dict:
+    return {"final_report": f"## Executive Summary\n\n{summary.strip()}\n\n{body}"}
+
+def merge_sections(state):
+    """Assemble the sections and write the executive summary last"""
+    body = _assemble_sections(state)
+    summary = _call_model("junior_analyst", _build_summary_messages(state, body), _cache_subject(state, "summary")).content
+    return _merged_report(summary, body)
+
+async def amerge_sections(state):
+    """Async variant of merge_sections"""
+    body = _assemble_sections(state)
+    summary = (await _acall_model("junior_analyst", _build_summary_messages(state, body),
+                                  _cache_subject(state, "summary"))).content
+    return _merged_report(summary, body)
+
+# Node names of the sections graph, for progress events
+SECTION_GRAPH_NODES = {f"{prefix}_{key}" for key, _, _ in REPORT_SECTIONS for prefix in ("section", "review")} | {"summary"}
+
+def create_sections_graph(checkpointer=None):
+    """Create the sections-mode research graph (parallel per-section drafting and review)"""
+    workflow = StateGraph(SectionsResearchState)
+    
+    workflow.add_node("initialize", _scheduled_node("initialize", initialize_sections, reduced=True))
+    workflow.add_node("review_gate", plan_section_review)
+    workflow.add_node("summary", _scheduled_node("summary", merge_sections, amerge_sections, reduced=True))
+    workflow.add_node("finalize", _scheduled_node("finalize", finalize_research, reduced=True))
+    
+    # Static fan-out: every section node runs in the same step, then joins at review_gate
+    # and again at summary
+    workflow.add_edge(START, "initialize")
+    for key, title, _ in REPORT_SECTIONS:
+        write, awrite = _section_writer(key, title)
+        workflow.add_node(f"section_{key}", _scheduled_node(
+            f"section_{key}", write, awrite, stage="section_draft", label=f"section_draft:{key}", reduced=True
+        ))
+        review, areview = _section_reviewer(key, title)
+        workflow.add_node(f"review_{key}", _scheduled_node(
+            f"review_{key}", review, areview, stage="section_review", label=f"section_review:{key}", reduced=True
+        ))
+        workflow.add_edge("initialize", f"section_{key}")
+        workflow.add_edge(f"section_{key}", "review_gate")
+        workflow.add_edge("review_gate", f"review_{key}")
+        workflow.add_edge(f"review_{key}", "summary")
+    
+    workflow.add_edge("summary", "finalize")
+    workflow.add_edge("finalize", END)
+    
+    return workflow.compile(checkpointer=checkpointer or create_checkpointer())
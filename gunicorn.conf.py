@@ -0,0 +1,56 @@
+"""
+Multi-worker launcher: gunicorn -c gunicorn.conf.py main:app
+
+Two ways of sharing one embedding model between API workers:
+
+- RETRIEVAL_SERVICE=1 (default): a single retrieval service process (retrieval_service.py)
+  owns the model, chroma_db and all ingestion; workers call it over a Unix socket.
+- RETRIEVAL_SERVICE=0: the master ingests once in a subprocess, then loads the model weights
+  and forks the workers (preload_app), which share the weight pages copy-on-write. Each
+  worker still opens its own Chroma client, read-only in practice since ingestion is done.
+"""
+
+import os
+import secrets
+import subprocess
+import sys
+
+bind = os.getenv("BIND", "0.0.0.0:8001")
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "300"))
+# Import the app (and, without the retrieval service, the model weights) once before forking
+preload_app = True
+
+USE_RETRIEVAL_SERVICE = os.getenv("RETRIEVAL_SERVICE", "1") not in ("0", "false", "False")
+
+# Set before the app is preloaded so vector_store picks up the socket in the master and every worker
+if USE_RETRIEVAL_SERVICE:
+    os.environ.setdefault("RETRIEVAL_SERVICE_SOCKET", os.path.abspath("./cache/retrieval.sock"))
+    os.environ.setdefault("RETRIEVAL_SERVICE_AUTHKEY", secrets.token_hex(16))
+
+_retrieval_service = None
+
+def on_starting(server):
+    global _retrieval_service
+    if USE_RETRIEVAL_SERVICE:
+        server.log.info("Starting retrieval service on %s", os.environ["RETRIEVAL_SERVICE_SOCKET"])
+        _retrieval_service = subprocess.Popen([sys.executable, "-m", "retrieval_service"])
+    else:
+        # Serialize ingestion: finish it before any worker opens chroma_db
+        subprocess.run([sys.executable, "-m", "ingestion"], check=True)
+        from embedding_backends import preload_embeddings
+        preload_embeddings()
+        server.log.info("Embedding model preloaded for copy-on-write sharing")
+
+def when_ready(server):
+    if _retrieval_service is not None:
+        # Fork workers only once the service is listening (it ingests first)
+        from retrieval_service import connect
+        connect(os.environ["RETRIEVAL_SERVICE_SOCKET"]).close()
+        server.log.info("Retrieval service is ready")
+
+def on_exit(server):
+    if _retrieval_service is not None and _retrieval_service.poll() is None:
+        _retrieval_service.terminate()
+        _retrieval_service.wait(timeout=30)
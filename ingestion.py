@@ -0,0 +1,294 @@
+"""
+Parallel, batched ingestion pipeline for research documents
+
+Stages:
+    1. read + hash + split files across a process pool, a bounded window of files at a time
+    2. embed chunks in fixed-size batches on a thread pool
+    3. upsert embedded batches into Chroma from a dedicated writer thread
+
+Every stage is bounded (files in flight, embedding batches, write queue), so peak memory
+depends on the window sizes and the largest single file, not on the corpus size.
+
+Usage:
+    python ingestion.py --docs ./docs --processes 4 --embed-batch-size 256
+"""
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Dict, Any, Tuple, Iterable, Iterator, Callable, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+CHUNK_SEPARATORS = ["\n## ", "\n### ", "\n#### ", "\n\n", "\n", " ", ""]
+
+INGEST_PROCESSES = int(os.getenv("INGEST_PROCESSES", str(os.cpu_count() or 1)))
+INGEST_EMBED_BATCH_SIZE = int(os.getenv("INGEST_EMBED_BATCH_SIZE", "256"))
+INGEST_EMBED_THREADS = int(os.getenv("INGEST_EMBED_THREADS", "2"))
+INGEST_WRITE_BATCH_SIZE = int(os.getenv("INGEST_WRITE_BATCH_SIZE", "1000"))
+# Files split ahead of the embedder (0 = twice the process count)
+INGEST_WINDOW_FILES = int(os.getenv("INGEST_WINDOW_FILES", "0"))
+# How often a running sync persists its progress so a crash resumes instead of restarting
+INGEST_CHECKPOINT_SECONDS = float(os.getenv("INGEST_CHECKPOINT_SECONDS", "30"))
+
+def create_text_splitter():
+    """Create the text splitter used for every research document"""
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    
+    return RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        separators=CHUNK_SEPARATORS
+    )
+
+def company_code_from_filename(filename: str) -> str:
+    """Extract company code from filename (e.g. AAPL_research.md -> AAPL)"""
+    return filename.split('_')[0] if '_' in filename else 'UNKNOWN'
+
+def hash_file(file_path: str) -> str:
+    """Content hash used to detect changed documents"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def chunk_ids(filename: str, file_hash: str, count: int) -> List[str]:
+    """Deterministic chunk IDs so re-ingesting identical content is an idempotent upsert"""
+    return [f"{filename}:{file_hash[:16]}:{i}" for i in range(count)]
+
+def manifest_chunk_ids(filename: str, entry: Dict[str, Any]) -> List[str]:
+    """Chunk IDs of a manifest entry (derived from the hash and count; older manifests list them)"""
+    if "chunk_ids" in entry:
+        return entry["chunk_ids"]
+    return chunk_ids(filename, entry["hash"], entry["chunks"])
+
+def split_file(file_path: str) -> Dict[str, Any]:
+    """
+    Read, hash and split one file into tagged chunks (runs inside a worker process)
+    
+    Returns plain data (no Document objects) so results pickle cheaply back to the parent.
+    """
+    from langchain_community.document_loaders import TextLoader
+    
+    started = time.perf_counter()
+    filename = os.path.basename(file_path)
+    file_hash = hash_file(file_path)
+    documents = TextLoader(file_path, encoding="utf-8").load()
+    split_docs = create_text_splitter().split_documents(documents)
+    
+    texts, metadatas = [], []
+    for doc in split_docs:
+        metadata = dict(doc.metadata)
+        metadata['company_code'] = company_code_from_filename(filename)
+        metadata['document_type'] = 'research_report'
+        metadata['source_file'] = filename
+        texts.append(doc.page_content)
+        metadatas.append(metadata)
+    
+    return {
+        "filename": filename,
+        "hash": file_hash,
+        "ids": chunk_ids(filename, file_hash, len(texts)),
+        "texts": texts,
+        "metadatas": metadatas,
+        "seconds": time.perf_counter() - started
+    }
+
+class IngestionPipeline:
+    """
+    Ingests files into a Chroma collection with parallel splitting, batched embedding
+    and pipelined, bounded-size upserts
+    """
+    
+    def __init__(self, collection, embeddings, processes: int = INGEST_PROCESSES,
+                 embed_batch_size: int = INGEST_EMBED_BATCH_SIZE, embed_threads: int = INGEST_EMBED_THREADS,
+                 write_batch_size: int = INGEST_WRITE_BATCH_SIZE, window_files: int = INGEST_WINDOW_FILES):
+        self.collection = collection
+        self.embeddings = embeddings
+        self.processes = max(1, processes)
+        self.embed_batch_size = max(1, embed_batch_size)
+        self.embed_threads = max(1, embed_threads)
+        self.write_batch_size = max(1, write_batch_size)
+        self.window_files = max(1, window_files or self.processes * 2)
+    
+    def _split_files(self, file_paths: Iterable[str]) -> Iterator[Dict[str, Any]]:
+        """Yield split results in order, keeping at most window_files files in flight"""
+        if self.processes == 1:
+            for file_path in file_paths:
+                yield split_file(file_path)
+            return
+        
+        # pool.map would submit every file up front and buffer all results; a sliding window doesn't.
+        # spawn: syncs run inside the threaded API or retrieval service process, which must not be forked
+        with ProcessPoolExecutor(max_workers=self.processes,
+                                 mp_context=multiprocessing.get_context("spawn")) as pool:
+            in_flight = deque()
+            for file_path in file_paths:
+                in_flight.append(pool.submit(split_file, file_path))
+                if len(in_flight) >= self.window_files:
+                    yield in_flight.popleft().result()
+            while in_flight:
+                yield in_flight.popleft().result()
+    
+    def run(self, file_paths: Iterable[str],
+            on_file_done: Optional[Callable[[str, Dict[str, Any]], None]] = None
+            ) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Any]]:
+        """
+        Ingest the given files (any iterable, consumed lazily)
+        
+        on_file_done(filename, {"hash", "chunks"}) is called from the writer thread once
+        every chunk of a file has been upserted, so callers can checkpoint progress.
+        Returns ({filename: {"hash", "chunks"}}, throughput report).
+        """
+        wall_started = time.perf_counter()
+        report = {
+            "files": 0,
+            "chunks": 0,
+            "split_seconds": 0.0,
+            "embed_seconds": 0.0,
+            "write_seconds": 0.0
+        }
+        ingested = {}
+        
+        # Embedded batches flow to a single writer thread through a bounded queue,
+        # so embedding the next batch overlaps with writing the previous one
+        write_queue: queue.Queue = queue.Queue(maxsize=self.embed_threads * 2)
+        write_errors = []
+        
+        # filename -> chunks not yet written, for per-file completion callbacks
+        remaining: Dict[str, int] = {}
+        remaining_lock = threading.Lock()
+        
+        def file_done(filename: str):
+            if on_file_done is not None:
+                on_file_done(filename, ingested[filename])
+        
+        def chunks_written(metadatas):
+            finished = []
+            with remaining_lock:
+                for metadata in metadatas:
+                    filename = metadata["source_file"]
+                    remaining[filename] -= 1
+                    if remaining[filename] == 0:
+                        del remaining[filename]
+                        finished.append(filename)
+            for filename in finished:
+                file_done(filename)
+        
+        def writer():
+            while True:
+                item = write_queue.get()
+                if item is None:
+                    return
+                ids, embeddings, texts, metadatas = item
+                started = time.perf_counter()
+                try:
+                    for start in range(0, len(ids), self.write_batch_size):
+                        end = start + self.write_batch_size
+                        self.collection.upsert(
+                            ids=ids[start:end],
+                            embeddings=embeddings[start:end],
+                            documents=texts[start:end],
+                            metadatas=metadatas[start:end]
+                        )
+                        chunks_written(metadatas[start:end])
+                except Exception as e:
+                    write_errors.append(e)
+                report["write_seconds"] += time.perf_counter() - started
+        
+        def embed(batch):
+            ids, texts, metadatas = batch
+            started = time.perf_counter()
+            vectors = self.embeddings.embed_documents(texts)
+            return ids, vectors, texts, metadatas, time.perf_counter() - started
+        
+        writer_thread = threading.Thread(target=writer, name="ingestion-writer", daemon=True)
+        writer_thread.start()
+        
+        pending = []
+        buffer_ids, buffer_texts, buffer_metadatas = [], [], []
+        
+        def drain(limit: int):
+            # Hand finished embedding batches to the writer, oldest first
+            while len(pending) > limit:
+                ids, vectors, texts, metadatas, seconds = pending.pop(0).result()
+                report["embed_seconds"] += seconds
+                write_queue.put((ids, vectors, texts, metadatas))
+        
+        try:
+            with ThreadPoolExecutor(max_workers=self.embed_threads, thread_name_prefix="ingestion-embed") as embed_pool:
+                def flush():
+                    batch = (buffer_ids[:], buffer_texts[:], buffer_metadatas[:])
+                    buffer_ids.clear(); buffer_texts.clear(); buffer_metadatas.clear()
+                    pending.append(embed_pool.submit(embed, batch))
+                    drain(self.embed_threads)
+                
+                for result in self._split_files(file_paths):
+                    report["files"] += 1
+                    report["chunks"] += len(result["ids"])
+                    report["split_seconds"] += result["seconds"]
+                    ingested[result["filename"]] = {"hash": result["hash"], "chunks": len(result["ids"])}
+                    if result["ids"]:
+                        with remaining_lock:
+                            remaining[result["filename"]] = len(result["ids"])
+                    else:
+                        file_done(result["filename"])
+                    
+                    for chunk in zip(result["ids"], result["texts"], result["metadatas"]):
+                        buffer_ids.append(chunk[0])
+                        buffer_texts.append(chunk[1])
+                        buffer_metadatas.append(chunk[2])
+                        if len(buffer_ids) >= self.embed_batch_size:
+                            flush()
+                
+                if buffer_ids:
+                    flush()
+                drain(0)
+        finally:
+            write_queue.put(None)
+            writer_thread.join()
+        
+        if write_errors:
+            raise write_errors[0]
+        
+        wall_seconds = time.perf_counter() - wall_started
+        report["wall_seconds"] = wall_seconds
+        report["chunks_per_second"] = report["chunks"] / wall_seconds if wall_seconds > 0 else 0.0
+        logger.info(f"Ingestion throughput: {report}")
+        return ingested, report
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync a docs directory into the research vector store")
+    parser.add_argument("--docs", default="./docs", help="Directory of markdown research documents")
+    parser.add_argument("--processes", type=int, default=INGEST_PROCESSES)
+    parser.add_argument("--embed-batch-size", type=int, default=INGEST_EMBED_BATCH_SIZE)
+    parser.add_argument("--embed-threads", type=int, default=INGEST_EMBED_THREADS)
+    parser.add_argument("--write-batch-size", type=int, default=INGEST_WRITE_BATCH_SIZE)
+    args = parser.parse_args()
+    
+    from vector_store import ResearchVectorStore, get_research_vectorstore, RETRIEVAL_SERVICE_SOCKET
+    
+    # With a retrieval service running it owns chroma_db; ingest through it so writes stay serialized
+    vectorstore = get_research_vectorstore() if RETRIEVAL_SERVICE_SOCKET else ResearchVectorStore()
+    stats = vectorstore.sync_documents(
+        os.path.abspath(args.docs),
+        processes=args.processes,
+        embed_batch_size=args.embed_batch_size,
+        embed_threads=args.embed_threads,
+        write_batch_size=args.write_batch_size
+    )
+    print(json.dumps(stats, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+"""
+Persistent research job queue
+
+Submitting returns a job id immediately; a fixed pool of workers on the API event loop
+runs the research graph, so throughput is bounded by the pool size rather than by how many
+client connections stay open. Job state and results live in SQLite, shared by every API
+worker process using the same file.
+"""
+
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, Any, Optional, List
+from models import ResearchJobRequest
+import logging
+
+logger = logging.getLogger(__name__)
+
+RESEARCH_JOB_DB_PATH = os.getenv("RESEARCH_JOB_DB_PATH", "./cache/research_jobs.sqlite3")
+RESEARCH_JOB_WORKERS = int(os.getenv("RESEARCH_JOB_WORKERS", "4"))
+RESEARCH_JOB_MAX_DEPTH = int(os.getenv("RESEARCH_JOB_MAX_DEPTH", "100"))
+RESEARCH_JOB_RETENTION_SECONDS = float(os.getenv("RESEARCH_JOB_RETENTION_SECONDS", str(24 * 60 * 60)))
+RESEARCH_JOB_MAX_WAIT_SECONDS = float(os.getenv("RESEARCH_JOB_MAX_WAIT_SECONDS", "60"))
+# How often a running server deletes finished jobs past the retention period
+RESEARCH_JOB_PURGE_INTERVAL_SECONDS = float(os.getenv("RESEARCH_JOB_PURGE_INTERVAL_SECONDS", "600"))
+# Idle workers re-check the table this often to pick up jobs submitted to other processes
+RESEARCH_JOB_POLL_SECONDS = float(os.getenv("RESEARCH_JOB_POLL_SECONDS", "1.0"))
+
+TERMINAL_STATUSES = ("succeeded", "failed")
+
+class QueueFullError(Exception):
+    """Raised when a submission would exceed the maximum queue depth"""
+
+class ResearchJobQueue:
+    """
+    SQLite-backed priority queue of research jobs with an asyncio worker pool
+    
+    Jobs are claimed with a conditional UPDATE inside an IMMEDIATE transaction, so several
+    API processes can share one queue file. Jobs left running by a process that died are
+    requeued when the next process on the same host starts.
+    """
+    
+    def __init__(self, db_path: str = RESEARCH_JOB_DB_PATH, workers: int = RESEARCH_JOB_WORKERS,
+                 max_depth: int = RESEARCH_JOB_MAX_DEPTH, retention_seconds: float = RESEARCH_JOB_RETENTION_SECONDS):
+        self.db_path = db_path
+        self.workers = max(1, workers)
+        self.max_depth = max_depth
+        self.retention_seconds = retention_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._lock = threading.Lock()
+        self._tasks: List[asyncio.Task] = []
+        self._changed: Optional[asyncio.Condition] = None
+        self._last_purge = 0.0
+        
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        # Autocommit mode; multi-statement operations open their own IMMEDIATE transactions
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS research_jobs (
+                job_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                priority INTEGER NOT NULL,
+                request TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                owner TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL
+            )"""
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS research_jobs_queue ON research_jobs (status, priority DESC, created_at)"
+        )
+    
+    # Storage ------------------------------------------------------------
+    
+    @staticmethod
+    def _row_to_job(row) -> Dict[str, Any]:
+        job_id, status, priority, result, error, created_at, started_at, finished_at = row
+        return {
+            "job_id": job_id,
+            "status": status,
+            "priority": priority,
+            "created_at": created_at,
+            "started_at": started_at,
+            "finished_at": finished_at,
+            "result": json.loads(result) if result else None,
+            "error": error
+        }
+    
+    def submit(self, request: ResearchJobRequest) -> Dict[str, Any]:
+        """Enqueue a request and return the new job, or raise QueueFullError"""
+        job_id = uuid.uuid4().hex
+        created_at = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                depth = self._conn.execute("SELECT COUNT(*) FROM research_jobs WHERE status = 'queued'").fetchone()[0]
+                if depth >= self.max_depth:
+                    raise QueueFullError(f"Research job queue is full ({depth} queued)")
+                self._conn.execute(
+                    "INSERT INTO research_jobs (job_id, status, priority, request, created_at) VALUES (?, 'queued', ?, ?, ?)",
+                    (job_id, request.priority, request.model_dump_json(), created_at)
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self._row_to_job((job_id, "queued", request.priority, None, None, created_at, None, None))
+    
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return a job by id, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                """SELECT job_id, status, priority, result, error, created_at, started_at, finished_at
+                FROM research_jobs WHERE job_id = ?""",
+                (job_id,)
+            ).fetchone()
+        return self._row_to_job(row) if row else None
+    
+    def _claim(self) -> Optional[tuple]:
+        """Mark the highest-priority, oldest queued job as running and return (job_id, request json)"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    """SELECT job_id, request FROM research_jobs WHERE status = 'queued'
+                    ORDER BY priority DESC, created_at ASC LIMIT 1"""
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE research_jobs SET status = 'running', owner = ?, started_at = ? WHERE job_id = ?",
+                        (self.owner, time.time(), row[0])
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return row
+    
+    def _finish(self, job_id: str, status: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE research_jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE job_id = ?",
+                (status, json.dumps(result) if result is not None else None, error, time.time(), job_id)
+            )
+    
+    def _recover(self) -> int:
+        """Requeue jobs left running by processes on this host that no longer exist"""
+        host = socket.gethostname()
+        requeued = 0
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT job_id, owner FROM research_jobs WHERE status = 'running' AND owner LIKE ?", (f"{host}:%",)
+            ).fetchall()
+            for job_id, owner in rows:
+                pid = int(owner.rsplit(":", 1)[1])
+                if pid != os.getpid() and _pid_alive(pid):
+                    continue
+                self._conn.execute(
+                    "UPDATE research_jobs SET status = 'queued', owner = NULL, started_at = NULL WHERE job_id = ? AND status = 'running'",
+                    (job_id,)
+                )
+                requeued += 1
+        if requeued:
+            logger.info(f"Requeued {requeued} interrupted research jobs")
+        return requeued
+    
+    def _purge(self) -> int:
+        """Delete finished jobs older than the retention period"""
+        if self.retention_seconds <= 0:
+            return 0
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM research_jobs WHERE status IN ('succeeded', 'failed') AND finished_at < ?",
+                (time.time() - self.retention_seconds,)
+            )
+        return cursor.rowcount
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Job counts by status, plus the pool size and depth limit"""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM research_jobs GROUP BY status").fetchall()
+        counts = {status: 0 for status in ("queued", "running") + TERMINAL_STATUSES}
+        counts.update(dict(rows))
+        return {**counts, "workers": self.workers, "max_depth": self.max_depth}
+    
+    # Workers ------------------------------------------------------------
+    
+    async def _notify(self):
+        async with self._changed:
+            self._changed.notify_all()
+    
+    async def _run_job(self, job_id: str, request_json: str):
+        from research_service import run_research
+        
+        try:
+            request = ResearchJobRequest.model_validate_json(request_json)
+            if request.thread_id == "default":
+                # Keep each job's checkpoint separate
+                request = request.model_copy(update={"thread_id": f"job-{job_id}"})
+            response = await run_research(request)
+            status, result, error = "succeeded", response.model_dump(), None
+        except asyncio.CancelledError:
+            # Shutting down: the job stays running and is requeued by the next process
+            raise
+        except Exception as e:
+            logger.error(f"Research job {job_id} failed: {e}")
+            status, result, error = "failed", None, f"Error processing request: {str(e)}"
+        await asyncio.to_thread(self._finish, job_id, status, result, error)
+        await self._notify()
+    
+    async def _maybe_purge(self):
+        """Enforce job retention, at most once per RESEARCH_JOB_PURGE_INTERVAL_SECONDS across the pool"""
+        now = time.monotonic()
+        if now - self._last_purge < RESEARCH_JOB_PURGE_INTERVAL_SECONDS:
+            return
+        self._last_purge = now
+        try:
+            purged = await asyncio.to_thread(self._purge)
+        except sqlite3.Error as e:
+            logger.error(f"Error purging research jobs: {e}")
+            return
+        if purged:
+            logger.info(f"Purged {purged} finished research jobs")
+    
+    async def _worker(self):
+        while True:
+            await self._maybe_purge()
+            try:
+                claimed = await asyncio.to_thread(self._claim)
+            except sqlite3.Error as e:
+                logger.error(f"Error claiming research job: {e}")
+                claimed = None
+            if claimed is None:
+                async with self._changed:
+                    try:
+                        await asyncio.wait_for(self._changed.wait(), RESEARCH_JOB_POLL_SECONDS)
+                    except asyncio.TimeoutError:
+                        pass
+                continue
+            try:
+                await self._run_job(*claimed)
+            except sqlite3.Error as e:
+                # Keep the worker alive; the job stays running until _recover requeues it after this process exits
+                logger.error(f"Error recording research job {claimed[0]}: {e}")
+    
+    def start(self):
+        """Requeue orphaned jobs and start the worker pool (call from the running event loop)"""
+        if self._tasks:
+            return
+        self._changed = asyncio.Condition()
+        self._recover()
+        self._purge()
+        self._last_purge = time.monotonic()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        logger.info(f"Research job queue started with {self.workers} workers")
+    
+    async def stop(self):
+        """Cancel the worker pool"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+    
+    async def enqueue(self, request: ResearchJobRequest) -> Dict[str, Any]:
+        """Submit a job and wake an idle worker"""
+        job = await asyncio.to_thread(self.submit, request)
+        if self._changed is not None:
+            await self._notify()
+        return job
+    
+    async def wait(self, job_id: str, timeout: float = 0.0) -> Optional[Dict[str, Any]]:
+        """Return the job once it has finished or after timeout seconds (long-poll)"""
+        deadline = time.monotonic() + min(max(timeout, 0.0), RESEARCH_JOB_MAX_WAIT_SECONDS)
+        while True:
+            job = await asyncio.to_thread(self.get, job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job["status"] in TERMINAL_STATUSES or remaining <= 0:
+                return job
+            if self._changed is None:
+                await asyncio.sleep(min(remaining, RESEARCH_JOB_POLL_SECONDS))
+                continue
+            # Woken early when a job in this process finishes; the poll covers other processes
+            async with self._changed:
+                try:
+                    await asyncio.wait_for(self._changed.wait(), min(remaining, RESEARCH_JOB_POLL_SECONDS))
+                except asyncio.TimeoutError:
+                    pass
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+# Global instance
+research_job_queue = None
+
+def get_job_queue() -> ResearchJobQueue:
+    """Get or create the global research job queue instance"""
+    global research_job_queue
+    if research_job_queue is None:
+        research_job_queue = ResearchJobQueue()
+    return research_job_queue
@@ -0,0 +1,240 @@
+"""
+LLM-call cache for the junior and senior analyst nodes
+
+Lookups are scoped per (node, model, temperature, subject), where the subject names what
+the prompt is about (company, sector, report type and section), so a completion is never
+reused for a different company even when the prompts embed alike. An exact match on a hash of the
+normalized messages is tried first; with LLM_CACHE_SEMANTIC enabled, the prompt is then
+embedded with the vector store's MiniLM model and the closest cached prompt in the same
+scope is reused if its cosine similarity clears LLM_CACHE_SIMILARITY_THRESHOLD.
+"""
+
+import hashlib
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List, Tuple
+from metrics import LLM_CACHE_LOOKUPS
+import logging
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "./cache/llm_cache.sqlite3")
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", str(24 * 60 * 60)))
+LLM_CACHE_SEMANTIC = os.getenv("LLM_CACHE_SEMANTIC", "false").lower() == "true"
+LLM_CACHE_SIMILARITY_THRESHOLD = float(os.getenv("LLM_CACHE_SIMILARITY_THRESHOLD", "0.97"))
+# MiniLM only reads ~256 tokens, so long prompts are embedded in windows and mean-pooled
+LLM_CACHE_EMBED_WINDOW_CHARS = 1000
+
+def normalize_messages(messages) -> List[Tuple[str, str]]:
+    """(role, content) pairs with whitespace collapsed, so formatting-only differences still match"""
+    normalized = []
+    for message in messages:
+        if isinstance(message, tuple):
+            role, content = message
+        else:
+            role, content = message.type, message.content
+        normalized.append((role, re.sub(r"\s+", " ", str(content)).strip()))
+    return normalized
+
+def _normalize_vector(vector: List[float]) -> array:
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return array('f', (x / norm for x in vector))
+
+class LLMCache:
+    """
+    LRU+TTL cache of LLM completions with a SQLite tier
+    
+    Both tiers hold at most max_entries; the semantic index covers the in-memory tier,
+    which is reloaded from SQLite (embeddings included) on start.
+    """
+    
+    def __init__(self, db_path: str = LLM_CACHE_PATH, max_entries: int = LLM_CACHE_MAX_ENTRIES,
+                 ttl_seconds: float = LLM_CACHE_TTL_SECONDS, semantic: bool = LLM_CACHE_SEMANTIC,
+                 similarity_threshold: float = LLM_CACHE_SIMILARITY_THRESHOLD, embeddings=None):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.semantic = semantic
+        self.similarity_threshold = similarity_threshold
+        self._embeddings = embeddings
+        # key -> (scope, created_at, content, normalized embedding or None)
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "evictions": 0}
+        
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS llm_cache (
+                cache_key TEXT PRIMARY KEY,
+                scope TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                content TEXT NOT NULL,
+                embedding BLOB
+            )"""
+        )
+        self._conn.commit()
+        self._load()
+    
+    def _load(self):
+        """Warm the memory tier (and semantic index) from the newest unexpired rows"""
+        rows = self._conn.execute(
+            "SELECT cache_key, scope, created_at, content, embedding FROM llm_cache ORDER BY created_at DESC LIMIT ?",
+            (self.max_entries,)
+        ).fetchall()
+        for key, scope, created_at, content, blob in reversed(rows):
+            if self._is_expired(created_at):
+                continue
+            vector = array('f', blob) if blob else None
+            self._memory[key] = (scope, created_at, content, vector)
+    
+    @staticmethod
+    def make_scope(node: str, model: str, temperature: float, subject: str = "") -> str:
+        return f"{node}|{model}|{temperature}|{subject}"
+    
+    @staticmethod
+    def make_key(scope: str, normalized: List[Tuple[str, str]]) -> str:
+        material = json.dumps({"scope": scope, "messages": normalized})
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+    
+    def _is_expired(self, created_at: float) -> bool:
+        return self.ttl_seconds > 0 and time.time() - created_at > self.ttl_seconds
+    
+    def _get_embeddings(self):
+        if self._embeddings is None:
+            from vector_store import get_research_vectorstore
+            self._embeddings = get_research_vectorstore().embeddings
+        return self._embeddings
+    
+    def _embed(self, normalized: List[Tuple[str, str]]) -> Optional[array]:
+        text = "\n".join(f"{role}: {content}" for role, content in normalized)
+        windows = [text[i:i + LLM_CACHE_EMBED_WINDOW_CHARS] for i in range(0, len(text), LLM_CACHE_EMBED_WINDOW_CHARS)]
+        try:
+            vectors = self._get_embeddings().embed_documents(windows or [""])
+        except Exception as e:
+            logger.error(f"LLM cache embedding failed, semantic lookup skipped: {e}")
+            return None
+        pooled = [sum(column) / len(vectors) for column in zip(*vectors)]
+        return _normalize_vector(pooled)
+    
+    def _count(self, node: str, result: str):
+        self._counters[{"exact": "exact_hits", "semantic": "semantic_hits", "miss": "misses"}[result]] += 1
+        LLM_CACHE_LOOKUPS.inc(node=node, result=result)
+    
+    def lookup(self, node: str, model: str, temperature: float, messages,
+               subject: str = "") -> Tuple[Optional[str], Dict[str, Any]]:
+        """
+        Return (cached completion or None, handle); pass the handle to store() after a miss
+        
+        The handle carries the key and, when semantic lookup is on, the prompt embedding,
+        so a miss doesn't embed the prompt twice.
+        """
+        scope = self.make_scope(node, model, temperature, subject)
+        normalized = normalize_messages(messages)
+        key = self.make_key(scope, normalized)
+        handle = {"node": node, "scope": scope, "key": key, "vector": None}
+        
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and not self._is_expired(entry[1]):
+                self._memory.move_to_end(key)
+                self._count(node, "exact")
+                return entry[2], handle
+            row = self._conn.execute(
+                "SELECT created_at, content, embedding FROM llm_cache WHERE cache_key = ?", (key,)
+            ).fetchone()
+            if row is not None and not self._is_expired(row[0]):
+                self._store_in_memory(key, scope, row[0], row[1], array('f', row[2]) if row[2] else None)
+                self._count(node, "exact")
+                return row[1], handle
+        
+        if self.semantic:
+            vector = self._embed(normalized)
+            handle["vector"] = vector
+            if vector is not None:
+                best_key, best_similarity = None, -1.0
+                with self._lock:
+                    for candidate_key, (candidate_scope, created_at, _, candidate_vector) in self._memory.items():
+                        if candidate_scope != scope or candidate_vector is None or self._is_expired(created_at):
+                            continue
+                        similarity = sum(a * b for a, b in zip(vector, candidate_vector))
+                        if similarity > best_similarity:
+                            best_key, best_similarity = candidate_key, similarity
+                    if best_key is not None and best_similarity >= self.similarity_threshold:
+                        self._memory.move_to_end(best_key)
+                        self._count(node, "semantic")
+                        logger.debug(f"LLM cache semantic hit for {node} (similarity {best_similarity:.4f})")
+                        return self._memory[best_key][2], handle
+        
+        with self._lock:
+            self._count(node, "miss")
+        return None, handle
+    
+    def store(self, handle: Dict[str, Any], content: str):
+        """Cache a completion under the key (and embedding) computed by lookup()"""
+        if not content:
+            return
+        created_at = time.time()
+        vector = handle["vector"]
+        with self._lock:
+            self._store_in_memory(handle["key"], handle["scope"], created_at, content, vector)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (cache_key, scope, created_at, content, embedding) VALUES (?, ?, ?, ?, ?)",
+                (handle["key"], handle["scope"], created_at, content, vector.tobytes() if vector is not None else None)
+            )
+            # Keep the disk tier bounded too, evicting the oldest rows first
+            self._conn.execute(
+                """DELETE FROM llm_cache WHERE cache_key IN (
+                    SELECT cache_key FROM llm_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?
+                )""",
+                (self.max_entries,)
+            )
+            self._conn.commit()
+    
+    def _store_in_memory(self, key: str, scope: str, created_at: float, content: str, vector: Optional[array]):
+        self._memory[key] = (scope, created_at, content, vector)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._counters["evictions"] += 1
+    
+    def clear(self):
+        """Remove every cached completion"""
+        with self._lock:
+            self._memory.clear()
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters, hit rate and tier sizes"""
+        with self._lock:
+            disk_entries = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            lookups = self._counters["exact_hits"] + self._counters["semantic_hits"] + self._counters["misses"]
+            hits = self._counters["exact_hits"] + self._counters["semantic_hits"]
+            return {
+                **self._counters,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+                "semantic": self.semantic,
+                "similarity_threshold": self.similarity_threshold
+            }
+
+# Global instance
+llm_cache = None
+
+def get_llm_cache() -> LLMCache:
+    """Get or create the global LLM cache instance"""
+    global llm_cache
+    if llm_cache is None:
+        llm_cache = LLMCache()
+    return llm_cache
@@ -1,123 +1,289 @@
-from fastapi import FastAPI, HTTPException
-from typing import Dict, Any
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse, FileResponse
+from typing import Dict, Any, AsyncIterator
 import uvicorn
 import json
-import os
-from graph import create_research_graph
-from vector_store import initialize_vector_store
-from models import ResearchRequest, ResearchResponse
+from vector_store import initialize_vector_store, get_research_vectorstore
+from report_cache import get_report_cache
+from prompt_registry import get_prompt_registry
+from model_registry import warmup_models, aclose_models
+from context_compaction import get_compaction_stats
+from llm_cache import get_llm_cache, LLM_CACHE_ENABLED
+from metrics import register_collector, render_prometheus
+from models import ResearchRequest, ResearchResponse, BatchResearchRequest, ResearchJobRequest, ResearchJob
+from readiness import start_warmup, get_readiness, is_ready, mark_ready
+from research_service import (
+    get_research_graph,
+    build_graph_input,
+    extract_last_ai_message,
+    request_deadline_at,
+    is_degraded,
+    prepare_research,
+    get_cached_response,
+    cache_response,
+    attach_pdf,
+    run_research,
+    get_single_flight_stats
+)
+from graph import SECTION_GRAPH_NODES
+from batch import run_batch, DEFAULT_BATCH_CONCURRENCY
+from job_queue import get_job_queue, QueueFullError, RESEARCH_JOB_MAX_WAIT_SECONDS
+from pdf_export import get_pdf_exporter
 
 app = FastAPI(title="Equity Research Agent API with ChromaDB", version="1.0.0")
 
-# Initialize vector store on startup
+def warmup():
+    """Load the embedding model and vector store, chat clients, prompts and graph (runs off the event loop)"""
+    vectorstore = initialize_vector_store()
+    vectorstore.embeddings.embed_query("warmup")
+    print(f"✅ Vector store initialized: {vectorstore.get_collection_stats()}")
+    try:
+        warmup_models(connect=True)
+    except Exception as e:
+        print(f"❌ Error warming up chat models: {e}")
+    get_prompt_registry()
+    get_research_graph()
+    print("✅ Equity Research API ready")
+
+# Warm up in the background so the server accepts connections immediately
 @app.on_event("startup")
 async def startup_event():
-    """Initialize the vector store when the API starts"""
+    """Start background warmup of the vector store and models"""
     print("🚀 Initializing Equity Research API with ChromaDB...")
-    try:
-        vectorstore = initialize_vector_store()
-        stats = vectorstore.get_collection_stats()
-        print(f"✅ Vector store initialized: {stats}")
-    except Exception as e:
-        print(f"❌ Error initializing vector store: {e}")
+    start_warmup(warmup)
+    # Job workers wait for warmup inside run_research, so they can start right away
+    get_job_queue().start()
 
-# Load prompts data
-def load_prompts_data():
-    """Load the prompts configuration from JSON file"""
-    try:
-        prompts_path = os.path.join(os.path.dirname(__file__), "Prompts.json")
-        with open(prompts_path, 'r') as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"Error loading prompts: {e}")
-        return []
-
-PROMPTS_DATA = load_prompts_data()
-
-def get_prompt_for_request(company_code: str, sector_code: str, report_type: str) -> str:
-    """Get the specific prompt for the given parameters"""
-    # Search for matching prompt in the data
-    for prompt_config in PROMPTS_DATA:
-        if (prompt_config.get("CompanyCode") == company_code and 
-            prompt_config.get("SectorCode") == sector_code and 
-            prompt_config.get("ReportType") == report_type):
-            
-            prompt = prompt_config.get("Prompt", "No specific prompt found")
-            print(f"✅ Found matching prompt for {company_code}-{sector_code}-{report_type}")
-            return prompt
-    
-    # If no exact match found, return a generic prompt
-    generic_prompt = f"""You are an expert equity research analyst. Generate a comprehensive {report_type} 
-    for {company_code} in the {sector_code} sector. Provide professional analysis including company overview, 
-    financial performance, market position, risks, and investment recommendation."""
-    
-    print(f"⚠️ No specific prompt found, using generic prompt for {company_code}-{sector_code}-{report_type}")
-    return generic_prompt
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving"""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: warmup of the embedding model, vector store and graph has completed"""
+    readiness = get_readiness()
+    return JSONResponse(readiness, status_code=200 if readiness["status"] == "ready" else 503)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the job workers and PDF renderers, release the shared LLM connection pools and persist hot checkpoints"""
+    await get_job_queue().stop()
+    get_pdf_exporter().shutdown()
+    await aclose_models()
+    if is_ready() and hasattr(get_research_graph().checkpointer, "flush"):
+        get_research_graph().checkpointer.flush()
 
-# Pydantic models for request/response - moved to models/ package
+def _cache_gauges():
+    """Expose cache, compaction and checkpointer counters as Prometheus gauges"""
+    gauges = []
+    if not is_ready():
+        # Don't force the heavy initialization from a metrics scrape
+        return gauges
+    retrieval = get_research_vectorstore().get_cache_stats()
+    gauges.append(("research_retrieval_cache_events", "Retrieval cache hits and misses", [
+        ({"cache": cache, "result": result}, retrieval[f"{cache}_{result}"])
+        for cache in ("embedding", "result", "snapshot") for result in ("hits", "misses")
+    ]))
+    report = get_report_cache().get_stats()
+    gauges.append(("research_report_cache_events", "Report cache hits and misses", [
+        ({"result": "hits"}, report["hits"]), ({"result": "misses"}, report["misses"])
+    ]))
+    if LLM_CACHE_ENABLED:
+        gauges.append(("research_llm_cache_hit_rate", "Share of LLM calls served from the LLM-call cache", [
+            ({}, get_llm_cache().get_stats()["hit_rate"])
+        ]))
+    compaction = get_compaction_stats()
+    gauges.append(("research_context_tokens", "Context tokens before and after compaction", [
+        ({"kind": kind}, compaction[kind]) for kind in ("original_tokens", "sent_tokens", "tokens_saved")
+    ]))
+    if hasattr(get_research_graph().checkpointer, "get_stats"):
+        checkpoints = get_research_graph().checkpointer.get_stats()
+        gauges.append(("research_checkpoint_threads", "Checkpointed threads per tier", [
+            ({"tier": "hot"}, checkpoints["hot_threads"]), ({"tier": "persisted"}, checkpoints["persisted_threads"])
+        ]))
+    return gauges
 
-# Initialize the graph
-research_graph = create_research_graph()
+register_collector(_cache_gauges)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics: node, LLM and vector search latency histograms plus cache gauges"""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
 
 @app.get("/")
 async def root():
     return {"message": "Research Agent API is running!"}
 
+@app.get("/cache/stats")
+async def cache_stats():
+    """Hit/miss counters for the retrieval, report, LLM and PDF caches, context tokens saved and coalesced requests"""
+    if not is_ready():
+        raise HTTPException(status_code=503, detail="Service is warming up")
+    return {
+        "retrieval": get_research_vectorstore().get_cache_stats(),
+        "report": get_report_cache().get_stats(),
+        "context_compaction": get_compaction_stats(),
+        "single_flight": get_single_flight_stats(),
+        "jobs": get_job_queue().get_stats(),
+        "llm": get_llm_cache().get_stats() if LLM_CACHE_ENABLED else None,
+        "pdf": get_pdf_exporter().get_stats()
+    }
+
 @app.post("/research", response_model=ResearchResponse)
 async def research_query(request: ResearchRequest):
     """
     Generate equity research report based on company, sector, and report type
     """
     try:
-        config = {"configurable": {"thread_id": request.thread_id}}
+        return await run_research(request)
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
+
+# Graph nodes reported as progress events on the streaming endpoint
+STREAMED_NODES = {"initialize", "junior_analyst", "senior_analyst", "finalize"} | SECTION_GRAPH_NODES
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """Format a single server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def stream_research_events(request: ResearchRequest) -> AsyncIterator[str]:
+    """Run the research graph asynchronously and yield SSE progress, token and result events"""
+    config = {"configurable": {"thread_id": request.thread_id}}
+    deadline_at = request_deadline_at(request)
+    
+    # Send the first byte immediately, before any retrieval or LLM work
+    yield format_sse("start", {
+        "company_code": request.company_code,
+        "sector_code": request.sector_code,
+        "report_type": request.report_type,
+        "thread_id": request.thread_id
+    })
+    
+    try:
+        specific_prompt, research_context = await prepare_research(request)
+        
+        cached = await get_cached_response(request, specific_prompt, research_context)
+        if cached is not None:
+            mark_ready()
+            yield format_sse("result", cached.model_dump())
+            return
         
-        # Get the specific prompt for this request
-        specific_prompt = get_prompt_for_request(
-            request.company_code, 
-            request.sector_code, 
-            request.report_type
-        )
-          # Run the graph with the specific prompt and request parameters
         final_result = None
+        stages_run = []
+        graph = get_research_graph(request.mode)
         
-        # Use stream_mode="values" to get the final state values
-        for state in research_graph.stream(
-            {
-                "messages": [("user", specific_prompt)],
-                "company_code": request.company_code,
-                "sector_code": request.sector_code,
-                "report_type": request.report_type
-            }, 
+        async for event in graph.astream_events(
+            build_graph_input(request, specific_prompt, research_context, deadline_at),
             config,
-            stream_mode="values"
+            version="v2"
         ):
-            print(f"DEBUG API: State keys: {list(state.keys())}")
-            if "messages" in state:
-                messages = state["messages"]
-                print(f"DEBUG API: Found {len(messages)} total messages")
-                
-                # Get the last AI message
-                for msg in reversed(messages):
-                    if (hasattr(msg, 'content') and 
-                        msg.content and 
-                        hasattr(msg, 'type') and 
-                        msg.type == 'ai'):
-                        final_result = msg.content
-                        print(f"DEBUG API: Found AI message: {msg.content[:100]}...")
-                        break
-        return ResearchResponse(
+            kind = event["event"]
+            node = event.get("metadata", {}).get("langgraph_node")
+            
+            if kind in ("on_chain_start", "on_chain_end") and event["name"] in STREAMED_NODES:
+                status = "started" if kind == "on_chain_start" else "completed"
+                yield format_sse("node", {"node": event["name"], "status": status})
+                if kind == "on_chain_end" and event["name"] == "finalize":
+                    output = event["data"].get("output") or {}
+                    final_result = extract_last_ai_message(output) or final_result
+            elif kind == "on_chat_model_stream":
+                token = event["data"]["chunk"].content
+                if token:
+                    yield format_sse("token", {"node": node, "content": token})
+        
+        # The full stage list lives in the checkpoint (nodes may only return their own stage)
+        final_state = await graph.aget_state(config)
+        stages_run = final_state.values.get("stages_run") or stages_run
+        
+        response = ResearchResponse(
             result=final_result or "No result generated",
             company_code=request.company_code,
             sector_code=request.sector_code,
             report_type=request.report_type,
             thread_id=request.thread_id,
-            status="success"
+            status="success",
+            stages_run=stages_run,
+            degraded=is_degraded(stages_run)
         )
+        if final_result:
+            response = await attach_pdf(response)
+            await cache_response(request, response, specific_prompt, research_context)
+        mark_ready()
+        yield format_sse("result", response.model_dump())
     
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
+        yield format_sse("error", {"detail": f"Error processing request: {str(e)}"})
+
+@app.post("/research/stream")
+async def research_stream(request: ResearchRequest):
+    """
+    Stream equity research report generation as server-sent events
+    
+    Emits `start`, then `node` progress and `token` events as they arrive,
+    and finally a `result` event carrying the ResearchResponse (or `error`).
+    """
+    return StreamingResponse(
+        stream_research_events(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/research/batch")
+async def research_batch(request: BatchResearchRequest):
+    """
+    Generate many research reports in one call, streamed back as NDJSON
+    
+    Context is retrieved once per company and graphs run with bounded concurrency;
+    each output line is a ResearchResponse plus the row `index`, in completion order.
+    """
+    concurrency = request.concurrency or DEFAULT_BATCH_CONCURRENCY
+    
+    async def ndjson_lines():
+        async for result in run_batch(request.requests, concurrency):
+            yield json.dumps(result) + "\n"
+    
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+@app.post("/research/jobs", response_model=ResearchJob, status_code=202)
+async def submit_research_job(request: ResearchJobRequest):
+    """
+    Queue an equity research report and return its job id immediately
+    
+    Poll (or long-poll with `wait`) GET /research/jobs/{job_id} for the result.
+    Returns 429 when the queue is at its maximum depth.
+    """
+    try:
+        return await get_job_queue().enqueue(request)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
+
+@app.get("/research/jobs/{job_id}", response_model=ResearchJob)
+async def get_research_job(job_id: str, wait: float = Query(default=0, ge=0, le=RESEARCH_JOB_MAX_WAIT_SECONDS,
+                                                            description="Seconds to wait for the job to finish")):
+    """Get a research job's status and, once it has succeeded, its report"""
+    job = await get_job_queue().wait(job_id, wait)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Research job {job_id} not found")
+    return job
 
-  
+@app.get("/research/pdf/{pdf_id}")
+async def get_research_pdf(pdf_id: str):
+    """
+    Download the PDF of a report by the pdf_id returned with its ResearchResponse
+    
+    Returns 202 while the PDF is still rendering and 404 for an id this process
+    hasn't seen (a render scheduled by another worker becomes available once it finishes).
+    """
+    status = get_pdf_exporter().get_status(pdf_id)
+    if status["status"] == "ready":
+        return FileResponse(status["path"], media_type="application/pdf", filename=f"{pdf_id}.pdf")
+    if status["status"] == "rendering":
+        return JSONResponse({"pdf_id": pdf_id, "status": "rendering"}, status_code=202, headers={"Retry-After": "2"})
+    if status["status"] == "failed":
+        raise HTTPException(status_code=500, detail=f"PDF rendering failed: {status['error']}")
+    raise HTTPException(status_code=404, detail=f"PDF {pdf_id} not found")
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8001)
@@ -0,0 +1,177 @@
+"""
+Lightweight instrumentation: Prometheus-format counters and histograms, timing spans
+and the switch for per-request debug logging
+"""
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Per-request debug output is off unless RESEARCH_DEBUG=true
+RESEARCH_DEBUG = os.getenv("RESEARCH_DEBUG", "false").lower() == "true"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger whose debug output follows the RESEARCH_DEBUG switch"""
+    logger = logging.getLogger(name)
+    logger.setLevel(logging.DEBUG if RESEARCH_DEBUG else logging.INFO)
+    return logger
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+class Counter:
+    """Monotonic counter with labels"""
+    
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+    
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(dict(zip(self.labelnames, key)))} {value}")
+        return lines
+
+class Histogram:
+    """Cumulative-bucket histogram with labels"""
+    
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+    
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [bucket counts..., +Inf count, sum]
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[len(self.buckets)] += 1
+            series[-1] += value
+    
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the with-block"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                labels = dict(zip(self.labelnames, key))
+                for i, bound in enumerate(self.buckets):
+                    lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': repr(bound)})} {series[i]}")
+                lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': '+Inf'})} {series[len(self.buckets)]}")
+                lines.append(f"{self.name}_sum{_format_labels(labels)} {series[-1]}")
+                lines.append(f"{self.name}_count{_format_labels(labels)} {series[len(self.buckets)]}")
+        return lines
+
+# Gauge collectors: callables returning (name, help, [(labels, value)]) evaluated at scrape time
+GaugeSamples = Tuple[str, str, Iterable[Tuple[Dict[str, str], float]]]
+_collectors: List[Callable[[], List[GaugeSamples]]] = []
+
+def register_collector(collector: Callable[[], List[GaugeSamples]]):
+    """Register a callable that reports gauge values when /metrics is scraped"""
+    _collectors.append(collector)
+
+# Metrics ----------------------------------------------------------------
+
+NODE_SECONDS = Histogram(
+    "research_graph_node_seconds", "Wall time of each research graph stage", ("stage",)
+)
+LLM_CALL_SECONDS = Histogram(
+    "research_llm_call_seconds", "Total LLM call latency", ("node", "model")
+)
+LLM_TIME_TO_FIRST_TOKEN_SECONDS = Histogram(
+    "research_llm_time_to_first_token_seconds", "Latency until the first streamed LLM token", ("node", "model")
+)
+LLM_PROMPT_TOKENS = Counter(
+    "research_llm_prompt_tokens_total", "Prompt tokens sent to the LLM", ("node", "model")
+)
+LLM_COMPLETION_TOKENS = Counter(
+    "research_llm_completion_tokens_total", "Completion tokens received from the LLM", ("node", "model")
+)
+EMBEDDING_SECONDS = Histogram(
+    "research_query_embedding_seconds", "Time spent embedding retrieval queries", ()
+)
+VECTOR_SEARCH_SECONDS = Histogram(
+    "research_vector_search_seconds", "Time spent in the Chroma vector query", ()
+)
+RESEARCH_SINGLE_FLIGHT_REQUESTS = Counter(
+    "research_single_flight_requests_total",
+    "Research requests that started a graph run (leader) or joined one in flight (coalesced)", ("role",)
+)
+LLM_CACHE_LOOKUPS = Counter(
+    "research_llm_cache_lookups_total", "LLM-call cache lookups by result (exact, semantic, miss)", ("node", "result")
+)
+
+METRICS = [
+    NODE_SECONDS,
+    LLM_CALL_SECONDS,
+    LLM_TIME_TO_FIRST_TOKEN_SECONDS,
+    LLM_PROMPT_TOKENS,
+    LLM_COMPLETION_TOKENS,
+    EMBEDDING_SECONDS,
+    VECTOR_SEARCH_SECONDS,
+    RESEARCH_SINGLE_FLIGHT_REQUESTS,
+    LLM_CACHE_LOOKUPS,
+]
+
+def record_llm_call(node: str, model: str, started: float, first_token_at: Optional[float],
+                    prompt_tokens: int, completion_tokens: int):
+    """Record one LLM call span"""
+    finished = time.perf_counter()
+    LLM_CALL_SECONDS.observe(finished - started, node=node, model=model)
+    if first_token_at is not None:
+        LLM_TIME_TO_FIRST_TOKEN_SECONDS.observe(first_token_at - started, node=node, model=model)
+    LLM_PROMPT_TOKENS.inc(prompt_tokens, node=node, model=model)
+    LLM_COMPLETION_TOKENS.inc(completion_tokens, node=node, model=model)
+
+def render_prometheus() -> str:
+    """Render every metric and registered gauge in the Prometheus text exposition format"""
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    for collector in _collectors:
+        try:
+            gauges = collector()
+        except Exception as e:
+            get_logger(__name__).error(f"Metrics collector failed: {e}")
+            continue
+        for name, documentation, samples in gauges:
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
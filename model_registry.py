@@ -0,0 +1,113 @@
+"""
+Shared chat-model clients for the graph nodes
+
+Each (model, temperature) client is built once and every client shares one pooled
+keep-alive HTTP connection pool (sync and async), so LLM calls across requests and
+threads reuse warm TLS connections instead of reconnecting per node call.
+"""
+
+import os
+import threading
+from typing import Dict, Any, Tuple
+import httpx
+
+# Per-node model configuration, overridable through the environment
+NODE_MODELS = {
+    "junior_analyst": (
+        os.getenv("JUNIOR_ANALYST_MODEL", "groq:llama3-8b-8192"),
+        float(os.getenv("JUNIOR_ANALYST_TEMPERATURE", "0.7"))
+    ),
+    "senior_analyst": (
+        os.getenv("SENIOR_ANALYST_MODEL", "groq:llama3-8b-8192"),
+        float(os.getenv("SENIOR_ANALYST_TEMPERATURE", "0.3"))  # Lower temperature for more consistent feedback
+    ),
+}
+
+# Optional override of the provider endpoint (e.g. a local stub server for load tests)
+LLM_BASE_URL = os.getenv("LLM_BASE_URL")
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+LLM_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("LLM_KEEPALIVE_EXPIRY_SECONDS", "60"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "120"))
+
+_lock = threading.Lock()
+_models: Dict[Tuple[str, float], Any] = {}
+_overrides: Dict[str, Any] = {}
+_http_client = None
+_http_async_client = None
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=LLM_KEEPALIVE_EXPIRY_SECONDS
+    )
+
+def get_http_clients() -> Tuple[httpx.Client, httpx.AsyncClient]:
+    """Get or create the shared keep-alive HTTP clients used by every chat model"""
+    global _http_client, _http_async_client
+    with _lock:
+        if _http_client is None:
+            _http_client = httpx.Client(limits=_limits(), timeout=LLM_TIMEOUT_SECONDS)
+            _http_async_client = httpx.AsyncClient(limits=_limits(), timeout=LLM_TIMEOUT_SECONDS)
+        return _http_client, _http_async_client
+
+def get_node_model_config(node: str) -> Tuple[str, float]:
+    """Return the (model, temperature) configured for a graph node"""
+    return NODE_MODELS[node]
+
+def get_model_signature() -> Dict[str, list]:
+    """Identify the models and sampling settings that shape a generated report"""
+    return {node: [model, temperature] for node, (model, temperature) in NODE_MODELS.items()}
+
+def set_chat_model(node: str, model):
+    """Pin a specific chat model instance for a node (e.g. a stub model in benchmarks); None unpins"""
+    if model is None:
+        _overrides.pop(node, None)
+    else:
+        _overrides[node] = model
+
+def get_chat_model(node: str):
+    """Get the shared chat model client for a graph node, building it on first use"""
+    if node in _overrides:
+        return _overrides[node]
+    key = get_node_model_config(node)
+    model = _models.get(key)
+    if model is not None:
+        return model
+    
+    http_client, http_async_client = get_http_clients()
+    with _lock:
+        model = _models.get(key)
+        if model is None:
+            from langchain.chat_models import init_chat_model
+            
+            model_name, temperature = key
+            kwargs = {"http_client": http_client, "http_async_client": http_async_client}
+            if LLM_BASE_URL:
+                kwargs["base_url"] = LLM_BASE_URL
+            model = init_chat_model(model_name, temperature=temperature, **kwargs)
+            _models[key] = model
+        return model
+
+def warmup_models(connect: bool = False):
+    """Build every configured client at startup; optionally pre-open a pooled connection"""
+    for node in NODE_MODELS:
+        get_chat_model(node)
+    if connect and LLM_BASE_URL:
+        try:
+            get_http_clients()[0].get(LLM_BASE_URL)
+        except httpx.HTTPError as e:
+            print(f"⚠️ LLM connection warmup failed: {e}")
+    print(f"✅ Chat models ready: {get_model_signature()}")
+
+async def aclose_models():
+    """Close the shared HTTP connection pools"""
+    global _http_client, _http_async_client
+    with _lock:
+        http_client, http_async_client = _http_client, _http_async_client
+        _http_client = _http_async_client = None
+        _models.clear()
+    if http_client is not None:
+        http_client.close()
+        await http_async_client.aclose()
@@ -2,7 +2,7 @@
 Models package for the Equity Research Agent API
 """
 
-from .request_models import ResearchRequest
-from .response_models import ResearchResponse
+from .request_models import ResearchRequest, BatchResearchRequest, ResearchJobRequest
+from .response_models import ResearchResponse, ResearchJob
 
-__all__ = ["ResearchRequest", "ResearchResponse"]
+__all__ = ["ResearchRequest", "BatchResearchRequest", "ResearchJobRequest", "ResearchResponse", "ResearchJob"]
@@ -3,7 +3,7 @@ Request models for the Equity Research Agent API
 """
 
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Optional, List, Literal
 
 
 class ResearchRequest(BaseModel):
@@ -15,6 +15,8 @@ class ResearchRequest(BaseModel):
         sector_code (str): The sector code for the company (e.g., 'TECH', 'FINANCE')
         report_type (str): The type of report to generate (e.g., 'BUY_SELL_HOLD')
         thread_id (str): Unique identifier for the conversation thread (default: 'default')
+        deadline_ms (Optional[int]): Latency budget; review stages are skipped when they can't fit
+        mode (str): 'standard' (one report call plus review) or 'sections' (parallel per-section generation)
     """
     
     company_code: str = Field(
@@ -39,6 +41,78 @@ class ResearchRequest(BaseModel):
         default="default", 
         description="Unique identifier for the conversation thread"
     )
+    
+    deadline_ms: Optional[int] = Field(
+        default=None,
+        ge=1,
+        description="Latency budget in milliseconds; if set, senior review and revision are skipped when they can't fit"
+    )
+    
+    mode: Literal["standard", "sections"] = Field(
+        default="standard",
+        description="'sections' writes each report section in parallel with its own retrieval, then the executive summary"
+    )
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "company_code": "AAPL",
+                "sector_code": "TECH",
+                "report_type": "BUY_SELL_HOLD",
+                "thread_id": "user_session_123",
+                "deadline_ms": 20000,
+                "mode": "standard"
+            }
+        }
+
+
+class BatchResearchRequest(BaseModel):
+    """
+    Request model for bulk equity research report generation
+    
+    Attributes:
+        requests (List[ResearchRequest]): The individual research requests to run
+        concurrency (Optional[int]): Maximum number of graphs to run at once (server default if omitted)
+    """
+    
+    requests: List[ResearchRequest] = Field(
+        ..., 
+        description="Research requests to generate"
+    )
+    
+    concurrency: Optional[int] = Field(
+        default=None,
+        ge=1,
+        description="Maximum number of research graphs to run concurrently"
+    )
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "requests": [
+                    {"company_code": "AAPL", "sector_code": "IT", "report_type": "BuyReport"},
+                    {"company_code": "AAPL", "sector_code": "IT", "report_type": "SellReport"},
+                    {"company_code": "MSFT", "sector_code": "IT", "report_type": "FirstCutReport"}
+                ],
+                "concurrency": 4
+            }
+        }
+
+
+class ResearchJobRequest(ResearchRequest):
+    """
+    Request model for queued (asynchronous) equity research report generation
+    
+    Attributes:
+        priority (int): Higher-priority jobs are picked up first; equal priorities run in submission order
+    """
+    
+    priority: int = Field(
+        default=0,
+        ge=-10,
+        le=10,
+        description="Scheduling priority from -10 to 10 (higher runs first)"
+    )
 
     class Config:
         schema_extra = {
@@ -46,6 +120,7 @@ class ResearchRequest(BaseModel):
                 "company_code": "AAPL",
                 "sector_code": "TECH",
                 "report_type": "BUY_SELL_HOLD",
-                "thread_id": "user_session_123"
+                "thread_id": "user_session_123",
+                "priority": 5
             }
         }
@@ -3,7 +3,7 @@ Response models for the Equity Research Agent API
 """
 
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Optional, List
 
 
 class ResearchResponse(BaseModel):
@@ -17,7 +17,10 @@ class ResearchResponse(BaseModel):
         report_type (str): The type of report that was generated
         thread_id (str): The conversation thread identifier
         status (str): The status of the request processing
-        pdf_path (Optional[str]): Path to the generated PDF file (if applicable)
+        pdf_path (Optional[str]): Path to the generated PDF file, once it has been rendered
+        pdf_id (Optional[str]): Content hash of the report, to fetch at GET /research/pdf/{pdf_id}
+        stages_run (List[str]): Graph stages that ran, in order
+        degraded (bool): True when review stages were skipped to meet the deadline
     """
     
     result: str = Field(
@@ -53,7 +56,22 @@ class ResearchResponse(BaseModel):
     
     pdf_path: Optional[str] = Field(
         default=None,
-        description="Path to the generated PDF file"
+        description="Path to the generated PDF file, set when the PDF was already rendered"
+    )
+    
+    pdf_id: Optional[str] = Field(
+        default=None,
+        description="PDF identifier; GET /research/pdf/{pdf_id} returns the PDF once rendered"
+    )
+    
+    stages_run: List[str] = Field(
+        default_factory=list,
+        description="Graph stages that ran, in order"
+    )
+    
+    degraded: bool = Field(
+        default=False,
+        description="True when senior review or revision was skipped to meet the deadline"
     )
 
     class Config:
@@ -65,6 +83,66 @@ class ResearchResponse(BaseModel):
                 "report_type": "BUY_SELL_HOLD",
                 "thread_id": "user_session_123",
                 "status": "success",
-                "pdf_path": "/reports/AAPL_TECH_BUY_SELL_HOLD_20241201.pdf"
+                "pdf_path": "/reports/AAPL_TECH_BUY_SELL_HOLD_20241201.pdf",
+                "pdf_id": "3f2a9c0e5b7d41c8a6e2f09b1d4c7e8a5b3f6d2c9e1a7b4f8d0c3e6a9b2f5d1c",
+                "stages_run": ["initialize", "first_cut", "senior_review", "revision", "finalize"],
+                "degraded": False
             }
         }
+
+
+class ResearchJob(BaseModel):
+    """
+    Status of a queued research job
+    
+    Attributes:
+        job_id (str): Identifier to poll at GET /research/jobs/{job_id}
+        status (str): queued, running, succeeded or failed
+        priority (int): Scheduling priority the job was submitted with
+        created_at (float): Submission time (epoch seconds)
+        started_at (Optional[float]): When a worker picked the job up
+        finished_at (Optional[float]): When the job succeeded or failed
+        result (Optional[ResearchResponse]): The report, once the job succeeded
+        error (Optional[str]): The failure reason, if the job failed
+    """
+    
+    job_id: str = Field(
+        ..., 
+        description="Job identifier"
+    )
+    
+    status: str = Field(
+        ..., 
+        description="Job status: queued, running, succeeded or failed",
+        example="queued"
+    )
+    
+    priority: int = Field(
+        default=0,
+        description="Scheduling priority (higher runs first)"
+    )
+    
+    created_at: float = Field(
+        ..., 
+        description="Submission time in epoch seconds"
+    )
+    
+    started_at: Optional[float] = Field(
+        default=None,
+        description="Time a worker started the job"
+    )
+    
+    finished_at: Optional[float] = Field(
+        default=None,
+        description="Time the job finished"
+    )
+    
+    result: Optional[ResearchResponse] = Field(
+        default=None,
+        description="Generated report once the job has succeeded"
+    )
+    
+    error: Optional[str] = Field(
+        default=None,
+        description="Error message if the job failed"
+    )
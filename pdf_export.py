@@ -0,0 +1,234 @@
+"""
+PDF export of finished research reports
+
+Reports are rendered from their markdown in a process pool, off the request path: the API
+schedules a render and returns straight away with the report's pdf_id, and the PDF is served
+from GET /research/pdf/{pdf_id} once it exists. PDFs are cached on disk under the SHA-256 of
+the markdown, so an identical report is never rendered twice, across requests or processes.
+"""
+
+import hashlib
+import multiprocessing
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+PDF_EXPORT_ENABLED = os.getenv("PDF_EXPORT_ENABLED", "true").lower() == "true"
+PDF_EXPORT_DIR = os.getenv("PDF_EXPORT_DIR", "./cache/pdf")
+PDF_RENDER_PROCESSES = int(os.getenv("PDF_RENDER_PROCESSES", str(max(1, min(4, (os.cpu_count() or 2) // 2)))))
+# Oldest PDFs are deleted once the cache holds more than this many files (0 keeps everything)
+PDF_EXPORT_MAX_FILES = int(os.getenv("PDF_EXPORT_MAX_FILES", "1000"))
+# Most recent render failures remembered for GET /research/pdf/{pdf_id}
+PDF_EXPORT_MAX_FAILURES = int(os.getenv("PDF_EXPORT_MAX_FAILURES", "256"))
+# Bump when the layout changes so cached PDFs are re-rendered
+PDF_RENDERER_VERSION = "1"
+
+HEADING_SIZES = {1: 18, 2: 15, 3: 13, 4: 12}
+
+# Core PDF fonts are latin-1 only; map the usual LLM typography onto it
+_UNICODE_REPLACEMENTS = {
+    "‘": "'", "’": "'", "“": '"', "”": '"',
+    "–": "-", "—": "-", "•": "-", "…": "...", "→": "->"
+}
+
+def pdf_id_for(markdown: str) -> str:
+    """Content address of a report: SHA-256 of the renderer version and markdown"""
+    return hashlib.sha256(f"{PDF_RENDERER_VERSION}\n{markdown}".encode("utf-8")).hexdigest()
+
+def _latin1(text: str) -> str:
+    for char, replacement in _UNICODE_REPLACEMENTS.items():
+        text = text.replace(char, replacement)
+    return text.encode("latin-1", "replace").decode("latin-1")
+
+def render_markdown_pdf(markdown: str, path: str) -> str:
+    """
+    Render a markdown report to a PDF file (runs in the worker processes)
+    
+    Handles the subset the analyst prompts produce: headings, bullet and numbered
+    lists, and **bold**/__italic__ emphasis. The file is written under a temporary
+    name and renamed, so readers never see a partial PDF.
+    """
+    from fpdf import FPDF
+    from fpdf.enums import XPos, YPos
+    
+    pdf = FPDF()
+    pdf.set_margins(18, 18, 18)
+    pdf.set_auto_page_break(True, margin=18)
+    pdf.add_page()
+    
+    def write(text: str, height: float, indent: float = 0.0):
+        pdf.set_x(pdf.l_margin + indent)
+        pdf.multi_cell(0, height, text, markdown=True, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+    
+    for raw_line in markdown.splitlines():
+        line = _latin1(raw_line.rstrip())
+        stripped = line.strip()
+        if not stripped:
+            pdf.ln(3)
+            continue
+        if re.fullmatch(r"[-*_]{3,}", stripped):
+            pdf.ln(2)
+            pdf.line(pdf.l_margin, pdf.get_y(), pdf.w - pdf.r_margin, pdf.get_y())
+            pdf.ln(2)
+            continue
+        heading = re.match(r"(#{1,6})\s+(.*)", stripped)
+        if heading:
+            size = HEADING_SIZES.get(len(heading.group(1)), 12)
+            pdf.ln(2)
+            pdf.set_font("Helvetica", "B", size)
+            write(heading.group(2).replace("**", "").strip(), size * 0.5)
+            pdf.ln(1)
+            continue
+        pdf.set_font("Helvetica", "", 11)
+        item = re.match(r"([-*+]|\d+[.)])\s+(.*)", stripped)
+        if item:
+            marker = "-" if item.group(1) in "-*+" else item.group(1)
+            depth = min((len(line) - len(line.lstrip())) // 2, 4)
+            write(f"{marker} {item.group(2)}", 6, indent=4 + depth * 5)
+        else:
+            write(stripped, 6)
+    
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    pdf.output(temp_path)
+    os.replace(temp_path, path)
+    return path
+
+class PdfExporter:
+    """
+    Content-addressed PDF cache with a process pool of renderers
+    
+    Renders in flight are tracked per pdf_id, so concurrent requests for the same
+    report share one render. The most recent failures are remembered (LRU) until the
+    same report is submitted again.
+    """
+    
+    def __init__(self, export_dir: str = PDF_EXPORT_DIR, processes: int = PDF_RENDER_PROCESSES,
+                 max_files: int = PDF_EXPORT_MAX_FILES):
+        self.export_dir = os.path.abspath(export_dir)
+        self.processes = max(1, processes)
+        self.max_files = max_files
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pending: Dict[str, Future] = {}
+        self._failed: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"rendered": 0, "cache_hits": 0, "failures": 0, "evictions": 0}
+        os.makedirs(self.export_dir, exist_ok=True)
+    
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: forking the threaded API process could copy held locks into the children
+            self._pool = ProcessPoolExecutor(max_workers=self.processes,
+                                             mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+    
+    def path_for(self, pdf_id: str) -> str:
+        return os.path.join(self.export_dir, f"{pdf_id}.pdf")
+    
+    def submit(self, markdown: str) -> str:
+        """Schedule a render unless the PDF is cached or already rendering; returns the pdf_id"""
+        pdf_id = pdf_id_for(markdown)
+        path = self.path_for(pdf_id)
+        with self._lock:
+            if os.path.exists(path):
+                self._counters["cache_hits"] += 1
+                self._touch(path)
+                return pdf_id
+            if pdf_id in self._pending:
+                return pdf_id
+            self._failed.pop(pdf_id, None)
+            try:
+                future = self._get_pool().submit(render_markdown_pdf, markdown, path)
+            except BrokenProcessPool:
+                # A renderer died (e.g. OOM-killed); start a fresh pool
+                self._pool = None
+                future = self._get_pool().submit(render_markdown_pdf, markdown, path)
+            self._pending[pdf_id] = future
+        future.add_done_callback(lambda done: self._render_done(pdf_id, done))
+        return pdf_id
+    
+    @staticmethod
+    def _touch(path: str):
+        # Eviction is by mtime, so reused PDFs stay cached
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+    
+    def _render_done(self, pdf_id: str, future: Future):
+        error = None if future.cancelled() else future.exception()
+        with self._lock:
+            self._pending.pop(pdf_id, None)
+            if future.cancelled():
+                return
+            if error is not None:
+                self._counters["failures"] += 1
+                self._failed[pdf_id] = f"{type(error).__name__}: {error}"
+                self._failed.move_to_end(pdf_id)
+                while len(self._failed) > PDF_EXPORT_MAX_FAILURES:
+                    self._failed.popitem(last=False)
+            else:
+                self._counters["rendered"] += 1
+        if error is not None:
+            logger.error(f"PDF render {pdf_id} failed: {error}")
+        else:
+            self._evict()
+    
+    def _evict(self):
+        """Delete the oldest PDFs beyond max_files"""
+        if self.max_files <= 0:
+            return
+        try:
+            entries = [entry for entry in os.scandir(self.export_dir) if entry.name.endswith(".pdf")]
+        except OSError:
+            return
+        if len(entries) <= self.max_files:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_files]:
+            try:
+                os.remove(entry.path)
+                self._counters["evictions"] += 1
+            except OSError:
+                pass
+    
+    def get_status(self, pdf_id: str) -> Dict[str, Any]:
+        """Status of a PDF: ready (with its path), rendering, failed (with the error) or unknown"""
+        if not re.fullmatch(r"[0-9a-f]{64}", pdf_id):
+            return {"status": "unknown"}
+        path = self.path_for(pdf_id)
+        if os.path.exists(path):
+            return {"status": "ready", "path": path}
+        with self._lock:
+            if pdf_id in self._pending:
+                return {"status": "rendering"}
+            if pdf_id in self._failed:
+                return {"status": "failed", "error": self._failed[pdf_id]}
+        return {"status": "unknown"}
+    
+    def shutdown(self):
+        """Stop the render processes, dropping queued renders"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Render, cache-hit and failure counters plus renders in flight"""
+        with self._lock:
+            return {**self._counters, "rendering": len(self._pending), "processes": self.processes}
+
+# Global instance
+pdf_exporter = None
+
+def get_pdf_exporter() -> PdfExporter:
+    """Get or create the global PDF exporter instance"""
+    global pdf_exporter
+    if pdf_exporter is None:
+        pdf_exporter = PdfExporter()
+    return pdf_exporter
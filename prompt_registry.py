@@ -0,0 +1,131 @@
+"""
+Indexed, hot-reloading registry of research prompts
+
+Prompts come from Prompts.json or from a directory of JSON shards (each a list of
+prompt objects). Entries without a CompanyCode (or with "*") act as sector templates,
+and entries without CompanyCode and SectorCode act as report-type generic templates.
+Templates may use {company_code}, {sector_code} and {report_type} placeholders.
+"""
+
+import glob
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+PROMPTS_PATH = os.getenv("PROMPTS_PATH", os.path.join(os.path.dirname(__file__), "Prompts.json"))
+PROMPT_RELOAD_INTERVAL_SECONDS = float(os.getenv("PROMPT_RELOAD_INTERVAL_SECONDS", "2"))
+
+WILDCARD = "*"
+
+def _normalize(code) -> str:
+    return code if code else WILDCARD
+
+class PromptRegistry:
+    """
+    Resolves prompts through a (CompanyCode, SectorCode, ReportType) index with
+    company -> sector -> report-type fallback levels
+    
+    The index is rebuilt off to the side whenever the source files change and then
+    swapped in with a single reference assignment, so lookups never see a partial index.
+    """
+    
+    def __init__(self, path: str = PROMPTS_PATH, reload_interval: float = PROMPT_RELOAD_INTERVAL_SECONDS):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._index: Dict[Tuple[str, str, str], str] = {}
+        self._signature = None
+        self._last_check = 0.0
+        self._reload_lock = threading.Lock()
+        self.reload()
+    
+    def _source_files(self) -> List[str]:
+        if os.path.isdir(self.path):
+            return sorted(glob.glob(os.path.join(self.path, "*.json")))
+        return [self.path]
+    
+    @staticmethod
+    def _compute_signature(files: List[str]) -> tuple:
+        signature = []
+        for file_path in files:
+            try:
+                stat = os.stat(file_path)
+                signature.append((file_path, stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append((file_path, None, None))
+        return tuple(signature)
+    
+    def reload(self) -> bool:
+        """Rebuild the index from the source files; keeps the current index on error"""
+        files = self._source_files()
+        signature = self._compute_signature(files)
+        
+        index = {}
+        try:
+            for file_path in files:
+                with open(file_path, 'r', encoding="utf-8") as f:
+                    for prompt_config in json.load(f):
+                        key = (
+                            _normalize(prompt_config.get("CompanyCode")),
+                            _normalize(prompt_config.get("SectorCode")),
+                            _normalize(prompt_config.get("ReportType"))
+                        )
+                        # First definition wins, as with the original linear scan
+                        index.setdefault(key, prompt_config.get("Prompt", "No specific prompt found"))
+        except Exception as e:
+            print(f"Error loading prompts: {e}")
+            self._signature = signature
+            return False
+        
+        self._index = index
+        self._signature = signature
+        print(f"✅ Loaded {len(index)} prompts from {self.path}")
+        return True
+    
+    def _maybe_reload(self):
+        """Reload when the source files' mtimes change, checking at most every reload_interval"""
+        now = time.monotonic()
+        if now - self._last_check < self.reload_interval:
+            return
+        # Only one thread checks; the others keep serving the current index
+        if not self._reload_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_check = now
+            if self._compute_signature(self._source_files()) != self._signature:
+                self.reload()
+        finally:
+            self._reload_lock.release()
+    
+    def resolve(self, company_code: str, sector_code: str, report_type: str) -> Optional[Tuple[str, str]]:
+        """Return (prompt, match level) for the most specific match, or None"""
+        self._maybe_reload()
+        index = self._index
+        
+        for level, key in (
+            ("company", (company_code, sector_code, report_type)),
+            ("sector", (WILDCARD, sector_code, report_type)),
+            ("report_type", (WILDCARD, WILDCARD, report_type))
+        ):
+            template = index.get(key)
+            if template is not None:
+                prompt = (template
+                          .replace("{company_code}", company_code)
+                          .replace("{sector_code}", sector_code)
+                          .replace("{report_type}", report_type))
+                return prompt, level
+        return None
+    
+    def __len__(self) -> int:
+        return len(self._index)
+
+# Global instance
+prompt_registry = None
+
+def get_prompt_registry() -> PromptRegistry:
+    """Get or create the global prompt registry instance"""
+    global prompt_registry
+    if prompt_registry is None:
+        prompt_registry = PromptRegistry()
+    return prompt_registry
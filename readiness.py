@@ -0,0 +1,81 @@
+"""
+Background warmup and readiness tracking for the API process
+
+The server starts accepting connections immediately; the embedding model, vector store,
+chat-model clients and graph are built on a worker thread. Work that needs them awaits
+the warmup instead of failing or blocking the event loop.
+"""
+
+import asyncio
+import time
+from typing import Any, Callable, Dict, Optional
+
+_warmup_future: Optional[asyncio.Future] = None
+_warmup_started_at: Optional[float] = None
+_warmup_finished_at: Optional[float] = None
+
+def start_warmup(warmup: Callable[[], Any]) -> asyncio.Future:
+    """Run warmup() on the default executor; call from the running event loop"""
+    global _warmup_future, _warmup_started_at, _warmup_finished_at
+    
+    def run():
+        global _warmup_finished_at
+        try:
+            return warmup()
+        finally:
+            _warmup_finished_at = time.time()
+    
+    _warmup_started_at = time.time()
+    _warmup_finished_at = None
+    _warmup_future = asyncio.get_running_loop().run_in_executor(None, run)
+    return _warmup_future
+
+async def wait_for_warmup():
+    """
+    Wait for the background warmup if one is running
+    
+    A failed warmup is not re-raised: callers fall through to lazy initialization,
+    which retries and surfaces its own error.
+    """
+    if _warmup_future is None:
+        return
+    try:
+        # shield: a cancelled request must not cancel the shared warmup
+        await asyncio.shield(_warmup_future)
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        pass
+
+def mark_ready():
+    """
+    Record that lazy initialization succeeded after a failed warmup (call from the event loop)
+    
+    A request that completed has built everything warmup would have, so readiness
+    recovers instead of reporting the original warmup error for the life of the process.
+    """
+    global _warmup_future, _warmup_finished_at
+    if _warmup_future is None or not _warmup_future.done() or is_ready():
+        return
+    recovered = asyncio.get_running_loop().create_future()
+    recovered.set_result(None)
+    _warmup_future = recovered
+    _warmup_finished_at = time.time()
+
+def is_ready() -> bool:
+    """True once warmup finished successfully (or when no warmup was started, e.g. CLIs)"""
+    if _warmup_future is None:
+        return True
+    return _warmup_future.done() and not _warmup_future.cancelled() and _warmup_future.exception() is None
+
+def get_readiness() -> Dict[str, Any]:
+    """Readiness details for the /readyz endpoint"""
+    if _warmup_future is None:
+        return {"status": "ready"}
+    status = {"started_at": _warmup_started_at, "finished_at": _warmup_finished_at}
+    if not _warmup_future.done():
+        return {**status, "status": "warming_up"}
+    error = None if _warmup_future.cancelled() else _warmup_future.exception()
+    if _warmup_future.cancelled() or error is not None:
+        return {**status, "status": "error", "error": str(error or "warmup cancelled")}
+    return {**status, "status": "ready"}
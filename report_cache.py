@@ -0,0 +1,159 @@
+"""
+Report-level result cache: an in-memory LRU+TTL tier in front of a SQLite tier
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+REPORT_CACHE_ENABLED = os.getenv("REPORT_CACHE_ENABLED", "true").lower() == "true"
+REPORT_CACHE_PATH = os.getenv("REPORT_CACHE_PATH", "./cache/report_cache.sqlite3")
+REPORT_CACHE_MAX_ENTRIES = int(os.getenv("REPORT_CACHE_MAX_ENTRIES", "256"))
+REPORT_CACHE_TTL_SECONDS = float(os.getenv("REPORT_CACHE_TTL_SECONDS", str(6 * 60 * 60)))
+
+class ReportCache:
+    """
+    Caches generated reports keyed by resolved prompt, retrieved context and model settings.
+    
+    Every entry is stamped with the corpus generation it was built against; once the
+    vector store reports a newer generation (documents re-ingested) older entries are dropped.
+    """
+    
+    def __init__(self, db_path: str = REPORT_CACHE_PATH, max_entries: int = REPORT_CACHE_MAX_ENTRIES,
+                 ttl_seconds: float = REPORT_CACHE_TTL_SECONDS):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = None
+        self.hits = 0
+        self.misses = 0
+        
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS report_cache (
+                cache_key TEXT PRIMARY KEY,
+                generation INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                payload TEXT NOT NULL
+            )"""
+        )
+        self._conn.commit()
+    
+    @staticmethod
+    def make_key(prompt: str, context: str, model_signature: Dict[str, Any]) -> str:
+        """Build a cache key from the resolved prompt, a hash of the context and the model settings"""
+        context_hash = hashlib.sha256(context.encode("utf-8")).hexdigest()
+        material = json.dumps(
+            {"prompt": prompt, "context": context_hash, "models": model_signature},
+            sort_keys=True
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+    
+    def _is_expired(self, created_at: float) -> bool:
+        return self.ttl_seconds > 0 and time.time() - created_at > self.ttl_seconds
+    
+    def _sync_generation(self, generation: int):
+        """Drop every entry built against an older corpus generation (caller holds the lock)"""
+        if self._generation == generation:
+            return
+        self._memory.clear()
+        self._conn.execute("DELETE FROM report_cache WHERE generation != ?", (generation,))
+        self._conn.commit()
+        if self._generation is not None:
+            logger.info(f"Report cache invalidated for corpus generation {generation}")
+        self._generation = generation
+    
+    def get(self, key: str, generation: int) -> Optional[Dict[str, Any]]:
+        """Return the cached payload for key, or None on a miss"""
+        with self._lock:
+            self._sync_generation(generation)
+            
+            entry = self._memory.get(key)
+            if entry is not None:
+                created_at, payload = entry
+                if not self._is_expired(created_at):
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return payload
+                del self._memory[key]
+            
+            row = self._conn.execute(
+                "SELECT created_at, payload FROM report_cache WHERE cache_key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                created_at, payload_json = row
+                if not self._is_expired(created_at):
+                    payload = json.loads(payload_json)
+                    self._store_in_memory(key, created_at, payload)
+                    self.hits += 1
+                    return payload
+                self._conn.execute("DELETE FROM report_cache WHERE cache_key = ?", (key,))
+                self._conn.commit()
+            
+            self.misses += 1
+            return None
+    
+    def put(self, key: str, generation: int, payload: Dict[str, Any]):
+        """Store a payload in both tiers"""
+        with self._lock:
+            self._sync_generation(generation)
+            created_at = time.time()
+            self._store_in_memory(key, created_at, payload)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO report_cache (cache_key, generation, created_at, payload) VALUES (?, ?, ?, ?)",
+                (key, generation, created_at, json.dumps(payload))
+            )
+            # Keep the disk tier bounded too, evicting the oldest rows first
+            self._conn.execute(
+                """DELETE FROM report_cache WHERE cache_key IN (
+                    SELECT cache_key FROM report_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?
+                )""",
+                (self.max_entries * 8,)
+            )
+            self._conn.commit()
+    
+    def _store_in_memory(self, key: str, created_at: float, payload: Dict[str, Any]):
+        self._memory[key] = (created_at, payload)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+    
+    def clear(self):
+        """Remove every cached report"""
+        with self._lock:
+            self._memory.clear()
+            self._conn.execute("DELETE FROM report_cache")
+            self._conn.commit()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and tier sizes"""
+        with self._lock:
+            disk_entries = self._conn.execute("SELECT COUNT(*) FROM report_cache").fetchone()[0]
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+                "generation": self._generation
+            }
+
+# Global instance
+report_cache = None
+
+def get_report_cache() -> ReportCache:
+    """Get or create the global report cache instance"""
+    global report_cache
+    if report_cache is None:
+        report_cache = ReportCache()
+    return report_cache
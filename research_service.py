@@ -0,0 +1,264 @@
+"""
+Shared research execution helpers used by the API endpoints, the batch runner and the CLI
+"""
+
+from typing import Dict, Any, Optional, Tuple, List
+import asyncio
+import os
+import time
+from graph import create_research_graph, create_sections_graph
+from checkpointer import create_checkpointer
+from model_registry import get_model_signature
+from models import ResearchRequest, ResearchResponse
+from prompt_registry import get_prompt_registry
+from report_cache import get_report_cache, ReportCache, REPORT_CACHE_ENABLED
+from vector_store import get_research_vectorstore
+from pdf_export import get_pdf_exporter, PDF_EXPORT_ENABLED
+from metrics import get_logger, RESEARCH_SINGLE_FLIGHT_REQUESTS
+from readiness import wait_for_warmup, mark_ready
+
+# Coalesce concurrent identical requests onto one in-flight graph run
+RESEARCH_SINGLE_FLIGHT = os.getenv("RESEARCH_SINGLE_FLIGHT", "true").lower() == "true"
+
+logger = get_logger(__name__)
+
+def get_prompt_for_request(company_code: str, sector_code: str, report_type: str) -> str:
+    """Get the specific prompt for the given parameters"""
+    # O(1) lookup with company -> sector -> report-type fallback
+    match = get_prompt_registry().resolve(company_code, sector_code, report_type)
+    if match is not None:
+        prompt, level = match
+        logger.debug("Found matching %s prompt for %s-%s-%s", level, company_code, sector_code, report_type)
+        return prompt
+    
+    # If no match at any level, return a generic prompt
+    generic_prompt = f"""You are an expert equity research analyst. Generate a comprehensive {report_type} 
+    for {company_code} in the {sector_code} sector. Provide professional analysis including company overview, 
+    financial performance, market position, risks, and investment recommendation."""
+    
+    logger.debug("No specific prompt found, using generic prompt for %s-%s-%s", company_code, sector_code, report_type)
+    return generic_prompt
+
+# Graphs are built on first use (or during background warmup), not at import,
+# and share one checkpointer
+research_graphs = {}
+_checkpointer = None
+
+GRAPH_BUILDERS = {
+    "standard": create_research_graph,
+    "sections": create_sections_graph
+}
+
+def get_research_graph(mode: str = "standard"):
+    """Get or create the shared research graph for a mode ('standard' or 'sections')"""
+    global _checkpointer
+    if mode not in research_graphs:
+        if _checkpointer is None:
+            _checkpointer = create_checkpointer()
+        research_graphs[mode] = GRAPH_BUILDERS[mode](checkpointer=_checkpointer)
+    return research_graphs[mode]
+
+def request_deadline_at(request: ResearchRequest, started_at: Optional[float] = None) -> float:
+    """Absolute deadline (epoch seconds) for a request, or 0 if it has none"""
+    if not request.deadline_ms:
+        return 0.0
+    return (started_at or time.time()) + request.deadline_ms / 1000.0
+
+def build_graph_input(request: ResearchRequest, specific_prompt: str, research_context: Optional[str] = None,
+                      deadline_at: float = 0.0) -> Dict[str, Any]:
+    """Build the initial graph state for a research request"""
+    # Always set research_context and the scheduling fields so a reused thread_id never
+    # inherits stale values from its checkpoint; pre-fetched context skips retrieval.
+    # The sections graph reduces these fields across parallel nodes, where None resets them
+    sections = request.mode == "sections"
+    return {
+        "messages": [("user", specific_prompt)],
+        "company_code": request.company_code,
+        "sector_code": request.sector_code,
+        "report_type": request.report_type,
+        "research_context": research_context or "",
+        "deadline_at": deadline_at,
+        "stage_timings": None if sections else {},
+        "stages_run": None if sections else []
+    }
+
+def is_degraded(stages_run: List[str]) -> bool:
+    """A run is degraded when the review loop (or the per-section reviews) was cut short by the deadline"""
+    if "section_review_skipped" in stages_run:
+        return True
+    return "first_cut" in stages_run and "revision" not in stages_run
+
+def extract_last_ai_message(state: Dict[str, Any]):
+    """Return the content of the last AI message in a graph state, if any"""
+    for msg in reversed(state.get("messages", [])):
+        if (hasattr(msg, 'content') and 
+            msg.content and 
+            hasattr(msg, 'type') and 
+            msg.type == 'ai'):
+            return msg.content
+    return None
+
+async def retrieve_context(company_code: str) -> str:
+    """Retrieve the default research context for a company off the event loop"""
+    if not company_code or company_code == "UNKNOWN":
+        return ""
+    vectorstore = get_research_vectorstore()
+    return await asyncio.to_thread(vectorstore.get_context_for_company, company_code)
+
+async def prepare_research(request: ResearchRequest, research_context: Optional[str] = None) -> Tuple[str, str]:
+    """Resolve the prompt and research context for a request"""
+    # Retrieval and cache lookups need the vector store; wait for warmup rather than fail
+    await wait_for_warmup()
+    
+    specific_prompt = get_prompt_for_request(
+        request.company_code, 
+        request.sector_code, 
+        request.report_type
+    )
+    if research_context is None:
+        research_context = await retrieve_context(request.company_code)
+    return specific_prompt, research_context
+
+def _report_signature(request: ResearchRequest) -> Dict[str, Any]:
+    """Model settings, plus the graph mode when it isn't the standard one"""
+    signature = get_model_signature()
+    if request.mode != "standard":
+        signature = {**signature, "mode": request.mode}
+    return signature
+
+def _is_cacheable(research_context: str) -> bool:
+    # Never cache reports built on a failed retrieval
+    return REPORT_CACHE_ENABLED and not research_context.startswith("Error retrieving context")
+
+async def get_cached_response(request: ResearchRequest, specific_prompt: str, research_context: str) -> Optional[ResearchResponse]:
+    """Return a cached ResearchResponse for this prompt/context/model combination, if any"""
+    if not _is_cacheable(research_context):
+        return None
+    key = ReportCache.make_key(specific_prompt, research_context, _report_signature(request))
+    generation = get_research_vectorstore().corpus_generation
+    payload = await asyncio.to_thread(get_report_cache().get, key, generation)
+    if payload is None:
+        return None
+    logger.debug("Report cache hit for %s-%s-%s", request.company_code, request.sector_code, request.report_type)
+    return await attach_pdf(ResearchResponse(**{**payload, "thread_id": request.thread_id}))
+
+async def cache_response(request: ResearchRequest, response: ResearchResponse, specific_prompt: str, research_context: str):
+    """Store a freshly generated ResearchResponse in the report cache"""
+    if (not _is_cacheable(research_context) or response.status != "success"
+            or not response.result or response.degraded):
+        return
+    key = ReportCache.make_key(specific_prompt, research_context, _report_signature(request))
+    generation = get_research_vectorstore().corpus_generation
+    # pdf_path is re-resolved on every hit, since the PDF may have been evicted since
+    payload = response.model_dump(exclude={"thread_id", "pdf_path"})
+    await asyncio.to_thread(get_report_cache().put, key, generation, payload)
+
+async def attach_pdf(response: ResearchResponse) -> ResearchResponse:
+    """
+    Schedule the PDF render of a finished report without waiting for it
+    
+    Sets pdf_id, and pdf_path when the PDF is already in the on-disk cache.
+    """
+    if not PDF_EXPORT_ENABLED or response.status != "success" or not response.result:
+        return response
+    exporter = get_pdf_exporter()
+    try:
+        pdf_id = await asyncio.to_thread(exporter.submit, response.result)
+    except Exception as e:
+        logger.error("Error scheduling PDF export: %s", e)
+        return response
+    return response.model_copy(update={"pdf_id": pdf_id, "pdf_path": exporter.get_status(pdf_id).get("path")})
+
+async def _execute_research(request: ResearchRequest, specific_prompt: str,
+                            research_context: Optional[str] = None) -> ResearchResponse:
+    """Retrieve context, check the report cache and run the research graph for one request"""
+    config = {"configurable": {"thread_id": request.thread_id}}
+    deadline_at = request_deadline_at(request)
+    
+    if research_context is None:
+        research_context = await retrieve_context(request.company_code)
+    
+    cached = await get_cached_response(request, specific_prompt, research_context)
+    if cached is not None:
+        mark_ready()
+        return cached
+    
+    # Run the graph with the specific prompt and request parameters
+    final_result = None
+    stages_run = []
+    
+    # Use the async stream with stream_mode="values" so the event loop keeps
+    # serving other requests while the LLM nodes are waiting on the provider
+    async for state in get_research_graph(request.mode).astream(
+        build_graph_input(request, specific_prompt, research_context, deadline_at),
+        config,
+        stream_mode="values"
+    ):
+        stages_run = state.get("stages_run") or stages_run
+        ai_content = extract_last_ai_message(state)
+        if ai_content:
+            final_result = ai_content
+    
+    response = ResearchResponse(
+        result=final_result or "No result generated",
+        company_code=request.company_code,
+        sector_code=request.sector_code,
+        report_type=request.report_type,
+        thread_id=request.thread_id,
+        status="success",
+        stages_run=stages_run,
+        degraded=is_degraded(stages_run)
+    )
+    if final_result:
+        response = await attach_pdf(response)
+        await cache_response(request, response, specific_prompt, research_context)
+    # Retrieval, models and graph all worked, even if the background warmup had failed
+    mark_ready()
+    return response
+
+# Single-flight: (company, sector, report type, prompt, deadline budget) -> in-flight graph run
+_in_flight: Dict[tuple, asyncio.Task] = {}
+_single_flight_counters = {"leaders": 0, "coalesced": 0}
+
+def _finish_flight(key: tuple, task: asyncio.Task):
+    if _in_flight.get(key) is task:
+        del _in_flight[key]
+    # Mark the outcome as retrieved even if every waiting caller went away
+    if not task.cancelled():
+        task.exception()
+
+def get_single_flight_stats() -> Dict[str, int]:
+    """Counts of graph runs started and requests coalesced onto an in-flight run"""
+    return {**_single_flight_counters, "in_flight": len(_in_flight)}
+
+async def run_research(request: ResearchRequest, research_context: Optional[str] = None) -> ResearchResponse:
+    """
+    Run the research graph asynchronously for one request and build the response
+    
+    Concurrent requests for the same company, sector, report type, resolved prompt and mode
+    share one graph execution; every caller gets the result under its own thread_id.
+    The shared run is a separate task, so a disconnecting caller doesn't cancel it for the rest.
+    """
+    await wait_for_warmup()
+    specific_prompt = get_prompt_for_request(request.company_code, request.sector_code, request.report_type)
+    if not RESEARCH_SINGLE_FLIGHT:
+        return await _execute_research(request, specific_prompt, research_context)
+    
+    key = (request.company_code, request.sector_code, request.report_type, specific_prompt,
+           request.deadline_ms, request.mode)
+    task = _in_flight.get(key)
+    if task is None:
+        _single_flight_counters["leaders"] += 1
+        RESEARCH_SINGLE_FLIGHT_REQUESTS.inc(role="leader")
+        task = asyncio.ensure_future(_execute_research(request, specific_prompt, research_context))
+        _in_flight[key] = task
+        task.add_done_callback(lambda done: _finish_flight(key, done))
+    else:
+        _single_flight_counters["coalesced"] += 1
+        RESEARCH_SINGLE_FLIGHT_REQUESTS.inc(role="coalesced")
+        logger.debug("Coalesced %s-%s-%s onto an in-flight run", request.company_code, request.sector_code, request.report_type)
+    
+    response = await asyncio.shield(task)
+    if response.thread_id != request.thread_id:
+        response = response.model_copy(update={"thread_id": request.thread_id})
+    return response
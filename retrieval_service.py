@@ -0,0 +1,200 @@
+"""
+Local retrieval service for multi-worker deployments
+
+One process owns the embedding model, the Chroma PersistentClient on chroma_db and all
+ingestion; API workers call it over a Unix socket through RemoteResearchVectorStore, so
+memory does not grow with the worker count and there is a single SQLite writer.
+
+    RETRIEVAL_SERVICE_SOCKET=./cache/retrieval.sock python -m retrieval_service
+
+gunicorn.conf.py starts it automatically. Set RETRIEVAL_SERVICE_SOCKET (and optionally
+RETRIEVAL_SERVICE_AUTHKEY) in the API workers to route retrieval through it.
+"""
+
+import argparse
+import os
+import threading
+import time
+from multiprocessing.connection import Listener, Client, AuthenticationError
+from typing import Any, Dict, List, Optional
+from vector_store import ResearchVectorStore, RETRIEVAL_SERVICE_SOCKET
+import logging
+
+RETRIEVAL_SERVICE_AUTHKEY = os.getenv("RETRIEVAL_SERVICE_AUTHKEY", "")
+# How long clients keep retrying the connection while the service is still starting/ingesting
+RETRIEVAL_SERVICE_CONNECT_TIMEOUT = float(os.getenv("RETRIEVAL_SERVICE_CONNECT_TIMEOUT", "300"))
+
+logger = logging.getLogger(__name__)
+
+def _authkey() -> Optional[bytes]:
+    return RETRIEVAL_SERVICE_AUTHKEY.encode() if RETRIEVAL_SERVICE_AUTHKEY else None
+
+class RetrievalService:
+    """Serves ResearchVectorStore calls to API workers, one thread per connection"""
+    
+    READ_METHODS = {"get_context_for_company", "get_contexts_for_company", "get_merged_context_for_company",
+                    "search_documents_batch", "get_cache_stats", "get_collection_stats"}
+    WRITE_METHODS = {"sync_documents", "setup_vector_store", "build_context_snapshots"}
+    
+    def __init__(self, vectorstore: ResearchVectorStore):
+        self.vectorstore = vectorstore
+        # Ingestion is serialized here: this process is the only writer to chroma_db
+        self._ingest_lock = threading.Lock()
+    
+    def handle(self, method: str, args: tuple, kwargs: Dict[str, Any]) -> Any:
+        if method == "corpus_generation":
+            return self.vectorstore.corpus_generation
+        if method in ("embed_query", "embed_documents"):
+            return getattr(self.vectorstore.embeddings, method)(*args, **kwargs)
+        if method in self.READ_METHODS:
+            return getattr(self.vectorstore, method)(*args, **kwargs)
+        if method in self.WRITE_METHODS:
+            with self._ingest_lock:
+                return getattr(self.vectorstore, method)(*args, **kwargs)
+        raise ValueError(f"Unknown retrieval service method '{method}'")
+    
+    def _serve_connection(self, conn):
+        with conn:
+            while True:
+                try:
+                    method, args, kwargs = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    reply = ("ok", self.handle(method, args, kwargs))
+                except Exception as e:
+                    logger.error(f"Retrieval service error in {method}: {e}")
+                    reply = ("error", f"{type(e).__name__}: {e}")
+                try:
+                    conn.send(reply)
+                except OSError:
+                    return
+    
+    def serve_forever(self, address: str):
+        """Listen on a Unix socket (owner-only permissions) and serve until interrupted"""
+        os.makedirs(os.path.dirname(os.path.abspath(address)), exist_ok=True)
+        if os.path.exists(address):
+            os.remove(address)
+        previous_umask = os.umask(0o177)
+        try:
+            listener = Listener(address, family="AF_UNIX", authkey=_authkey())
+        finally:
+            os.umask(previous_umask)
+        logger.info(f"Retrieval service listening on {address}")
+        try:
+            while True:
+                try:
+                    conn = listener.accept()
+                except (AuthenticationError, OSError) as e:
+                    logger.warning(f"Rejected retrieval service connection: {e}")
+                    continue
+                threading.Thread(target=self._serve_connection, args=(conn,), daemon=True).start()
+        finally:
+            listener.close()
+
+def connect(address: str, timeout: float = RETRIEVAL_SERVICE_CONNECT_TIMEOUT):
+    """Connect to the retrieval service, retrying until it is listening or timeout expires"""
+    deadline = time.time() + timeout
+    while True:
+        try:
+            return Client(address, family="AF_UNIX", authkey=_authkey())
+        except (FileNotFoundError, ConnectionRefusedError):
+            if time.time() >= deadline:
+                raise
+            time.sleep(0.25)
+
+class RemoteEmbeddings:
+    """Embeddings computed by the retrieval service's model"""
+    
+    def __init__(self, store: "RemoteResearchVectorStore"):
+        self._store = store
+    
+    def embed_query(self, text: str) -> List[float]:
+        return self._store._call("embed_query", text)
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._store._call("embed_documents", texts)
+
+class RemoteResearchVectorStore:
+    """
+    Drop-in client for ResearchVectorStore backed by the retrieval service
+    
+    Each calling thread keeps its own connection, so concurrent to_thread retrievals
+    don't serialize on one socket.
+    """
+    
+    def __init__(self, address: str = RETRIEVAL_SERVICE_SOCKET):
+        self.address = address
+        self._local = threading.local()
+        self.embeddings = RemoteEmbeddings(self)
+    
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = connect(self.address)
+            self._local.conn = conn
+        return conn
+    
+    def _call(self, method: str, *args, **kwargs) -> Any:
+        # Retry once on a fresh connection if the service restarted underneath us
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.send((method, args, kwargs))
+                status, result = conn.recv()
+                break
+            except (EOFError, OSError):
+                self._local.conn = None
+                conn.close()
+                if attempt:
+                    raise
+        if status == "error":
+            raise RuntimeError(f"Retrieval service error: {result}")
+        return result
+    
+    @property
+    def corpus_generation(self) -> int:
+        return self._call("corpus_generation")
+    
+    def get_context_for_company(self, company_code: str, query: str = "", **kwargs) -> str:
+        return self._call("get_context_for_company", company_code, query, **kwargs)
+    
+    def get_contexts_for_company(self, company_code: str, queries: List[str], **kwargs) -> List[str]:
+        return self._call("get_contexts_for_company", company_code, queries, **kwargs)
+    
+    def get_merged_context_for_company(self, company_code: str, queries: List[str], **kwargs) -> str:
+        return self._call("get_merged_context_for_company", company_code, queries, **kwargs)
+    
+    def search_documents_batch(self, queries: List[str], company_code: str = None, k: int = 5) -> list:
+        return self._call("search_documents_batch", queries, company_code, k)
+    
+    def sync_documents(self, docs_directory: str, **kwargs) -> Dict[str, Any]:
+        return self._call("sync_documents", os.path.abspath(docs_directory), **kwargs)
+    
+    def setup_vector_store(self, *args, **kwargs):
+        return self._call("setup_vector_store", *args, **kwargs)
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        return self._call("get_cache_stats")
+    
+    def get_collection_stats(self) -> Dict[str, Any]:
+        return self._call("get_collection_stats")
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve retrieval and ingestion for API workers over a Unix socket")
+    parser.add_argument("--socket", default=RETRIEVAL_SERVICE_SOCKET or "./cache/retrieval.sock")
+    parser.add_argument("--persist-directory", default="./chroma_db")
+    args = parser.parse_args()
+    
+    vectorstore = ResearchVectorStore(persist_directory=args.persist_directory)
+    vectorstore.setup_vector_store()
+    # Start the inference thread pools before the first worker request
+    vectorstore.embeddings.embed_query("warmup")
+    
+    try:
+        RetrievalService(vectorstore).serve_forever(os.path.abspath(args.socket))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
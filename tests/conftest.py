@@ -0,0 +1,14 @@
+import os
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+# Keep caches, checkpoints and PDFs out of the working tree
+_scratch_dir = tempfile.mkdtemp(prefix="research-tests-")
+os.environ.setdefault("CHECKPOINT_DB_PATH", os.path.join(_scratch_dir, "checkpoints.sqlite3"))
+os.environ.setdefault("REPORT_CACHE_PATH", os.path.join(_scratch_dir, "report_cache.sqlite3"))
+os.environ.setdefault("RESEARCH_JOB_DB_PATH", os.path.join(_scratch_dir, "research_jobs.sqlite3"))
+os.environ.setdefault("LLM_CACHE_ENABLED", "false")
+os.environ.setdefault("PDF_EXPORT_ENABLED", "false")
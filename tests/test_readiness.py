@@ -0,0 +1,21 @@
+import asyncio
+import readiness
+
+def test_readiness_recovers_after_failed_warmup(monkeypatch):
+    monkeypatch.setattr(readiness, "_warmup_future", None)
+    
+    def failing_warmup():
+        raise RuntimeError("embedding model download failed")
+    
+    async def scenario():
+        readiness.start_warmup(failing_warmup)
+        await readiness.wait_for_warmup()
+        assert not readiness.is_ready()
+        assert readiness.get_readiness()["status"] == "error"
+        
+        # A request later succeeds through lazy initialization
+        readiness.mark_ready()
+        assert readiness.is_ready()
+        assert readiness.get_readiness()["status"] == "ready"
+    
+    asyncio.run(scenario())
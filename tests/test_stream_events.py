@@ -0,0 +1,49 @@
+import json
+from collections import Counter
+from fastapi.testclient import TestClient
+import main
+from benchmarks.stubs import StubChatModel
+from model_registry import set_chat_model
+
+def _parse_sse(body: str):
+    events = []
+    for frame in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in frame.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+def test_stream_sends_each_node_event_once(monkeypatch):
+    stub = StubChatModel(response_words=20)
+    for node in ("junior_analyst", "senior_analyst"):
+        set_chat_model(node, stub)
+    
+    async def prepare_research(request, research_context=None):
+        return "Generate a BUY report for AAPL.", "Context 1:\nRevenue grew 8% year over year."
+    
+    async def get_cached_response(*args):
+        return None
+    
+    async def cache_response(*args):
+        return None
+    
+    monkeypatch.setattr(main, "prepare_research", prepare_research)
+    monkeypatch.setattr(main, "get_cached_response", get_cached_response)
+    monkeypatch.setattr(main, "cache_response", cache_response)
+    try:
+        response = TestClient(main.app).post("/research/stream", json={
+            "company_code": "AAPL", "sector_code": "IT", "report_type": "BuyReport", "thread_id": "stream-events"
+        })
+    finally:
+        for node in ("junior_analyst", "senior_analyst"):
+            set_chat_model(node, None)
+    
+    events = _parse_sse(response.text)
+    node_events = Counter((data["node"], data["status"]) for event, data in events if event == "node")
+    # The junior analyst runs twice: first cut, then revision after the senior review
+    runs = {"initialize": 1, "junior_analyst": 2, "senior_analyst": 1, "finalize": 1}
+    assert node_events == Counter({
+        (node, status): count for node, count in runs.items() for status in ("started", "completed")
+    })
+    
+    result = [data for event, data in events if event == "result"]
+    assert len(result) == 1 and result[0]["stages_run"] == ["initialize", "first_cut", "senior_review", "revision", "finalize"]
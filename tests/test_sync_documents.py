@@ -0,0 +1,80 @@
+import os
+import pytest
+
+pytest.importorskip("chromadb")
+
+from ingestion import IngestionPipeline, chunk_ids, company_code_from_filename, hash_file
+from vector_store import ResearchVectorStore
+from benchmarks.stubs import HashingEmbeddings
+
+def _pipeline_run(fail_on=None):
+    """IngestionPipeline.run stand-in: one chunk per file, raising once it reaches fail_on"""
+    def run(self, file_paths, on_file_done=None):
+        for file_path in file_paths:
+            filename = os.path.basename(file_path)
+            if filename == fail_on:
+                raise RuntimeError("embedding backend crashed")
+            file_hash = hash_file(file_path)
+            with open(file_path, encoding="utf-8") as f:
+                text = f.read()
+            self.collection.upsert(
+                ids=chunk_ids(filename, file_hash, 1),
+                documents=[text],
+                embeddings=self.embeddings.embed_documents([text]),
+                metadatas=[{
+                    "company_code": company_code_from_filename(filename),
+                    "document_type": "research_report",
+                    "source_file": filename
+                }]
+            )
+            if on_file_done is not None:
+                on_file_done(filename, {"hash": file_hash, "chunks": 1})
+        return {}, {}
+    return run
+
+def _write(path, text):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+def test_failed_reingest_refreshes_derived_state(tmp_path, monkeypatch):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    _write(docs / "AAPL_research.md", "Apple quarterly outlook: obsolete guidance figures")
+    _write(docs / "MSFT_research.md", "Microsoft cloud revenue growth")
+    
+    store = ResearchVectorStore(persist_directory=str(tmp_path / "chroma_db"), embeddings=HashingEmbeddings())
+    monkeypatch.setattr(IngestionPipeline, "run", _pipeline_run())
+    store.sync_documents(str(docs), processes=1)
+    generation = store.corpus_generation
+    assert "obsolete" in store.get_context_for_company("AAPL")
+    
+    # The edit deletes AAPL's old chunk, then ingestion fails before writing the new one
+    _write(docs / "AAPL_research.md", "Apple quarterly outlook: revised guidance figures")
+    monkeypatch.setattr(IngestionPipeline, "run", _pipeline_run(fail_on="AAPL_research.md"))
+    stats = store.sync_documents(str(docs), processes=1)
+    
+    assert "error" in stats and stats["updated"] == 0
+    assert store.corpus_generation > generation
+    assert store.lexical_index.search("obsolete", "AAPL", 5) == []
+    assert "obsolete" not in store.get_context_for_company("AAPL")
+    
+    # The next sync re-ingests the file even though the manifest was saved after the failure
+    monkeypatch.setattr(IngestionPipeline, "run", _pipeline_run())
+    stats = store.sync_documents(str(docs), processes=1)
+    assert stats["added"] == 1
+    assert "revised" in store.get_context_for_company("AAPL")
+
+def test_add_documents_rebuilds_snapshots(tmp_path):
+    from langchain_core.documents import Document
+    
+    store = ResearchVectorStore(persist_directory=str(tmp_path / "chroma_db"), embeddings=HashingEmbeddings())
+    store.add_documents_to_store([
+        Document(page_content="Tesla delivery volumes and margins", metadata={"company_code": "TSLA"})
+    ])
+    assert "delivery volumes" in store.get_context_for_company("TSLA")
+    assert "TSLA" in store._snapshot_companies()
+    
+    store.add_documents_to_store([
+        Document(page_content="Tesla energy storage deployments", metadata={"company_code": "TSLA"})
+    ])
+    assert "energy storage" in store.get_context_for_company("TSLA")
@@ -1,31 +1,215 @@
 import os
-import chromadb
-from chromadb.config import Settings
-from langchain_chroma import Chroma
-from langchain_community.embeddings import SentenceTransformerEmbeddings
-from langchain_community.document_loaders import DirectoryLoader, TextLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+import re
+import glob
+import json
+import math
+import heapq
+import bisect
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict, Counter
 from langchain_core.documents import Document
-from typing import List, Dict, Any
+from ingestion import (
+    IngestionPipeline,
+    create_text_splitter,
+    company_code_from_filename,
+    hash_file,
+    split_file,
+    manifest_chunk_ids,
+    INGEST_CHECKPOINT_SECONDS,
+    INGEST_PROCESSES,
+    INGEST_EMBED_BATCH_SIZE,
+    INGEST_EMBED_THREADS,
+    INGEST_WRITE_BATCH_SIZE
+)
+from typing import List, Dict, Any, Iterable, Iterator, Tuple
+from metrics import EMBEDDING_SECONDS, VECTOR_SEARCH_SECONDS
 import logging
 
+RETRIEVAL_EMBEDDING_CACHE_SIZE = int(os.getenv("RETRIEVAL_EMBEDDING_CACHE_SIZE", "1024"))
+RETRIEVAL_RESULT_CACHE_SIZE = int(os.getenv("RETRIEVAL_RESULT_CACHE_SIZE", "256"))
+# Hybrid (dense + BM25) retrieval ranks exact tickers, periods and figures well enough
+# that fewer chunks are needed than with dense search alone
+DEFAULT_CONTEXT_K = int(os.getenv("RETRIEVAL_CONTEXT_K", "6"))
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "1") not in ("0", "false", "False")
+RRF_K = int(os.getenv("RETRIEVAL_RRF_K", "60"))
+# Skip the dense search when k lexical hits each cover at least this share of the query's IDF
+LEXICAL_STRONG_COVERAGE = float(os.getenv("LEXICAL_STRONG_COVERAGE", "1.0"))
+# When set, this process talks to the retrieval service on this Unix socket instead of
+# opening chroma_db and loading the embedding model itself (see retrieval_service.py)
+RETRIEVAL_SERVICE_SOCKET = os.getenv("RETRIEVAL_SERVICE_SOCKET", "")
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.,][0-9]+)*")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were will with".split()
+)
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word/number tokens; "Q3", "FY24", "AAPL" and "1,234.5" survive intact"""
+    return [
+        token.replace(",", "")
+        for token in _TOKEN_PATTERN.findall(text.lower())
+        if token not in _STOPWORDS
+    ]
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = RRF_K) -> List[str]:
+    """Fuse ranked ID lists by summing 1 / (k + rank)"""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+class LexicalIndex:
+    """
+    BM25 inverted index over the ingested chunks, stored as flat arrays
+    
+    Postings are kept in CSR form: the postings of term t are
+    docs[offsets[t]:offsets[t + 1]] (ascending chunk numbers) with matching term
+    frequencies in tfs. Queries score terms in descending IDF order and, once the
+    remaining terms can no longer lift a new chunk into the top k, only rescore the
+    surviving candidates (MaxScore-style early termination).
+    """
+    
+    def __init__(self, chunks: Iterable[Tuple[str, str, str]], k1: float = 1.2, b: float = 0.75):
+        """Build from (chunk_id, text, company_code) tuples, consumed once; texts are not kept"""
+        self.k1 = k1
+        self.b = b
+        self.chunk_ids: List[str] = []
+        self.companies: List[str] = []
+        company_numbers: Dict[str, int] = {}
+        self.doc_company = array('I')
+        self.doc_lengths = array('I')
+        
+        # Per-term postings are accumulated as compact arrays, so memory follows the postings
+        # rather than the text of the corpus
+        term_docs: Dict[str, array] = {}
+        term_tfs: Dict[str, array] = {}
+        for doc, (chunk_id, text, company_code) in enumerate(chunks):
+            self.chunk_ids.append(chunk_id)
+            if company_code not in company_numbers:
+                company_numbers[company_code] = len(self.companies)
+                self.companies.append(company_code)
+            self.doc_company.append(company_numbers[company_code])
+            counts = Counter(tokenize(text or ""))
+            self.doc_lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                if term not in term_docs:
+                    term_docs[term] = array('I')
+                    term_tfs[term] = array('H')
+                term_docs[term].append(doc)
+                term_tfs[term].append(min(tf, 65535))
+        
+        self.company_numbers = company_numbers
+        self.vocabulary: Dict[str, int] = {}
+        self.offsets = array('I', [0])
+        self.docs = array('I')
+        self.tfs = array('H')
+        for term in list(term_docs):
+            self.vocabulary[term] = len(self.vocabulary)
+            self.docs.extend(term_docs.pop(term))
+            self.tfs.extend(term_tfs.pop(term))
+            self.offsets.append(len(self.docs))
+        
+        self.average_length = (sum(self.doc_lengths) / len(self.doc_lengths)) if self.doc_lengths else 0.0
+    
+    def __len__(self) -> int:
+        return len(self.chunk_ids)
+    
+    def _idf(self, term_number: int) -> float:
+        df = self.offsets[term_number + 1] - self.offsets[term_number]
+        return math.log(1 + (len(self.chunk_ids) - df + 0.5) / (df + 0.5))
+    
+    def _term_score(self, idf: float, tf: int, doc: int) -> float:
+        norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc] / (self.average_length or 1.0))
+        return idf * tf * (self.k1 + 1) / (tf + norm)
+    
+    def search(self, query: str, company_code: str = None, k: int = 5) -> List[tuple]:
+        """Return up to k (chunk_id, bm25 score, idf coverage) tuples, best first"""
+        company = None
+        if company_code:
+            company = self.company_numbers.get(company_code)
+            if company is None:
+                return []
+        
+        query_terms = set(tokenize(query))
+        terms = [
+            (self._idf(self.vocabulary[term]), self.vocabulary[term])
+            for term in query_terms if term in self.vocabulary
+        ]
+        if not terms:
+            return []
+        terms.sort(reverse=True)
+        # Out-of-vocabulary terms count at the maximum IDF (df=0), so a query whose specific
+        # terms are unseen never reports full coverage from its common ones
+        unseen = len(query_terms) - len(terms)
+        total_idf = sum(idf for idf, _ in terms) + unseen * math.log(1 + (len(self.chunk_ids) + 0.5) / 0.5)
+        # Upper bound on the score still obtainable from terms[i:]
+        remaining = [0.0] * (len(terms) + 1)
+        for i in range(len(terms) - 1, -1, -1):
+            remaining[i] = remaining[i + 1] + terms[i][0] * (self.k1 + 1)
+        
+        scores: Dict[int, float] = {}
+        coverage: Dict[int, float] = {}
+        pruned = False
+        for i, (idf, term_number) in enumerate(terms):
+            start, end = self.offsets[term_number], self.offsets[term_number + 1]
+            if not pruned:
+                for position in range(start, end):
+                    doc = self.docs[position]
+                    if company is not None and self.doc_company[doc] != company:
+                        continue
+                    scores[doc] = scores.get(doc, 0.0) + self._term_score(idf, self.tfs[position], doc)
+                    coverage[doc] = coverage.get(doc, 0.0) + idf
+            else:
+                # Only existing candidates can still reach the top k: look them up by bisection
+                for doc in scores:
+                    position = bisect.bisect_left(self.docs, doc, start, end)
+                    if position < end and self.docs[position] == doc:
+                        scores[doc] += self._term_score(idf, self.tfs[position], doc)
+                        coverage[doc] += idf
+            
+            if len(scores) >= k and i + 1 < len(terms):
+                kth = heapq.nlargest(k, scores.values())[-1]
+                if kth >= remaining[i + 1]:
+                    pruned = True
+                    scores = {doc: score for doc, score in scores.items() if score + remaining[i + 1] >= kth}
+        
+        top = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(self.chunk_ids[doc], score, coverage[doc] / total_idf) for doc, score in top]
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "chunks": len(self.chunk_ids),
+            "terms": len(self.vocabulary),
+            "postings": len(self.docs),
+            "bytes": sum(a.itemsize * len(a) for a in (self.offsets, self.docs, self.tfs, self.doc_lengths, self.doc_company))
+        }
+
 class ResearchVectorStore:
     """
     Manages the vector store for equity research documents using ChromaDB
     """
     
-    def __init__(self, persist_directory: str = "./chroma_db"):
+    def __init__(self, persist_directory: str = "./chroma_db", embeddings=None):
+        # Heavy dependencies (chromadb, sentence-transformers/torch) are imported here rather
+        # than at module import so the API process can start accepting connections first
+        import chromadb
+        from langchain_chroma import Chroma
+        from embedding_backends import get_shared_embeddings
+        
         self.persist_directory = persist_directory
         self.collection_name = "equity_research"
         
-        # Initialize embeddings using SentenceTransformers (compatible with LangChain)
-        self.embeddings = SentenceTransformerEmbeddings(
-            model_name="all-MiniLM-L6-v2"
-        )
+        # Initialize all-MiniLM-L6-v2 embeddings on the backend selected by EMBEDDING_BACKEND
+        # (torch, onnx or onnx-int8) unless the caller supplies its own (e.g. offline benchmarks)
+        self.embeddings = embeddings or get_shared_embeddings()
         
         # Initialize ChromaDB
         self.client = chromadb.PersistentClient(path=persist_directory)
@@ -37,106 +221,526 @@ class ResearchVectorStore:
             embedding_function=self.embeddings,
         )
         
+        # Corpus generation, bumped on every ingestion so derived caches can invalidate
+        self.generation_path = os.path.join(persist_directory, "corpus_generation")
+        self.manifest_path = os.path.join(persist_directory, "ingest_manifest.json")
+        self._manifest_lock = threading.Lock()
+        self.corpus_generation = self._load_corpus_generation()
+        
+        # Retrieval caches: query text -> embedding, and (query, company filter, k) ->
+        # (corpus generation, documents); result entries from older generations are ignored
+        self._cache_lock = threading.Lock()
+        self._embedding_cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._result_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._cache_counters = {
+            "embedding_hits": 0,
+            "embedding_misses": 0,
+            "result_hits": 0,
+            "result_misses": 0,
+            "snapshot_hits": 0,
+            "snapshot_misses": 0,
+            "lexical_early_stops": 0
+        }
+        
+        # BM25 index over the same chunks, rebuilt whenever ingestion changes the corpus
+        self.lexical_index = None
+        
+        # Per-company default context snapshots, materialized at ingest time
+        self._snapshot_lock = threading.Lock()
+        self._snapshot_db = sqlite3.connect(
+            os.path.join(persist_directory, "context_snapshots.sqlite3"), check_same_thread=False
+        )
+        self._snapshot_db.execute(
+            """CREATE TABLE IF NOT EXISTS context_snapshots (
+                company_code TEXT PRIMARY KEY,
+                k INTEGER NOT NULL,
+                chunk_ids TEXT NOT NULL,
+                context TEXT NOT NULL,
+                built_at REAL NOT NULL
+            )"""
+        )
+        self._snapshot_db.commit()
+        
         logger.info(f"ChromaDB initialized at {persist_directory}")
     
+    def _load_corpus_generation(self) -> int:
+        """Read the persisted corpus generation number (0 if never ingested)"""
+        try:
+            with open(self.generation_path, 'r') as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+    
+    def bump_corpus_generation(self) -> int:
+        """Advance and persist the corpus generation after the documents change"""
+        self.corpus_generation += 1
+        with self._cache_lock:
+            self._result_cache.clear()
+        try:
+            with open(self.generation_path, 'w') as f:
+                f.write(str(self.corpus_generation))
+        except OSError as e:
+            logger.error(f"Error persisting corpus generation: {e}")
+        return self.corpus_generation
+    
+    def _create_text_splitter(self):
+        """Create the text splitter used for every research document"""
+        return create_text_splitter()
+    
+    @staticmethod
+    def _tag_metadata(doc: Document):
+        """Add metadata for better retrieval"""
+        # Extract company code from filename
+        filename = os.path.basename(doc.metadata.get('source', ''))
+        doc.metadata['company_code'] = company_code_from_filename(filename)
+        doc.metadata['document_type'] = 'research_report'
+        doc.metadata['source_file'] = filename
+    
+    def iter_documents_from_directory(self, docs_path: str) -> Iterator[Document]:
+        """Yield split, tagged chunks one file at a time (memory bounded by the largest file)"""
+        for file_path in sorted(glob.glob(os.path.join(docs_path, "*.md"))):
+            try:
+                result = split_file(file_path)
+            except Exception as e:
+                logger.error(f"Error loading {file_path}: {e}")
+                continue
+            for text, metadata in zip(result["texts"], result["metadatas"]):
+                yield Document(page_content=text, metadata=metadata)
+    
     def load_documents_from_directory(self, docs_path: str) -> List[Document]:
         """Load and split documents from the docs directory"""
+        split_docs = list(self.iter_documents_from_directory(docs_path))
+        logger.info(f"Loaded {len(split_docs)} document chunks from {docs_path}")
+        return split_docs
+    
+    def _load_manifest(self) -> Dict[str, Any]:
+        """Load the per-file ingestion manifest (None if this store predates it)"""
         try:
-            # Load markdown files
-            loader = DirectoryLoader(
-                docs_path, 
-                glob="*.md",
-                loader_cls=TextLoader,
-                loader_kwargs={"encoding": "utf-8"}
-            )
-            documents = loader.load()
-            
-            # Split documents into chunks
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=1000,
-                chunk_overlap=200,
-                separators=["\n## ", "\n### ", "\n#### ", "\n\n", "\n", " ", ""]
-            )
-            
-            split_docs = text_splitter.split_documents(documents)
-            
-            # Add metadata for better retrieval
-            for doc in split_docs:
-                # Extract company code from filename
-                filename = os.path.basename(doc.metadata.get('source', ''))
-                company_code = filename.split('_')[0] if '_' in filename else 'UNKNOWN'
-                doc.metadata['company_code'] = company_code
-                doc.metadata['document_type'] = 'research_report'
+            with open(self.manifest_path, 'r', encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"Error reading ingestion manifest, rebuilding: {e}")
+            return None
+    
+    def _save_manifest(self, manifest: Dict[str, Any]):
+        """Atomically write the ingestion manifest"""
+        tmp_path = f"{self.manifest_path}.tmp"
+        with self._manifest_lock:
+            with open(tmp_path, 'w', encoding="utf-8") as f:
+                json.dump(manifest, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.manifest_path)
+    
+    def sync_documents(self, docs_directory: str, processes: int = INGEST_PROCESSES,
+                       embed_batch_size: int = INGEST_EMBED_BATCH_SIZE, embed_threads: int = INGEST_EMBED_THREADS,
+                       write_batch_size: int = INGEST_WRITE_BATCH_SIZE) -> Dict[str, Any]:
+        """
+        Bring the collection in line with the markdown files in docs_directory
+        
+        Only new or edited files are re-chunked and re-embedded (through the parallel
+        IngestionPipeline), and chunks of removed files are deleted, so the cost is
+        proportional to the change set.
+        
+        Progress is checkpointed into the manifest every INGEST_CHECKPOINT_SECONDS as files
+        finish, so a sync that crashes partway resumes with the files it had not completed.
+        """
+        stats = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0, "chunks_written": 0}
+        manifest = self._load_manifest()
+        collection = self.client.get_or_create_collection(self.collection_name)
+        
+        # A previous sync died before finishing: the corpus changed since the last generation
+        resumed = bool(manifest and manifest.pop("in_progress", False))
+        if resumed:
+            stats["resumed"] = True
+            logger.info("Resuming interrupted document sync")
+        
+        if manifest is None:
+            manifest = {"files": {}}
+            # Chunks written before the manifest existed have random IDs we can't track
+            if collection.count() > 0:
+                logger.info("No ingestion manifest found, clearing untracked chunks before full sync")
+                collection.delete(where={"document_type": "research_report"})
+        
+        tracked = manifest["files"]
+        current_files = {
+            os.path.basename(path): path
+            for path in sorted(glob.glob(os.path.join(docs_directory, "*.md")))
+        }
+        
+        affected_companies = set()
+        
+        # Drop chunks for files that no longer exist
+        for filename in [name for name in tracked if name not in current_files]:
+            collection.delete(ids=manifest_chunk_ids(filename, tracked[filename]))
+            del tracked[filename]
+            affected_companies.add(company_code_from_filename(filename))
+            stats["removed"] += 1
+        
+        changed_paths = []
+        edited = set()
+        for filename, file_path in current_files.items():
+            entry = tracked.get(filename)
+            if entry and entry["hash"] == hash_file(file_path):
+                stats["unchanged"] += 1
+                continue
+            if entry:
+                # The old chunks are gone from here on, whether or not re-ingestion succeeds, so
+                # untrack them too: a failed file is re-ingested by the next sync even if reverted
+                collection.delete(ids=manifest_chunk_ids(filename, entry))
+                del tracked[filename]
+                edited.add(filename)
+                affected_companies.add(company_code_from_filename(filename))
+            changed_paths.append(file_path)
+        
+        if changed_paths:
+            manifest["in_progress"] = True
+            self._save_manifest(manifest)
+            last_checkpoint = [time.time()]
+            progress_lock = threading.Lock()
             
-            logger.info(f"Loaded {len(split_docs)} document chunks from {docs_path}")
-            return split_docs
+            def file_done(filename: str, entry: Dict[str, Any]):
+                # Called once all of a file's chunks are stored (usually from the pipeline's writer thread)
+                with progress_lock:
+                    affected_companies.add(company_code_from_filename(filename))
+                    stats["updated" if filename in edited else "added"] += 1
+                    stats["chunks_written"] += entry["chunks"]
+                    tracked[filename] = entry
+                    if time.time() - last_checkpoint[0] >= INGEST_CHECKPOINT_SECONDS:
+                        self._save_manifest(manifest)
+                        last_checkpoint[0] = time.time()
             
-        except Exception as e:
-            logger.error(f"Error loading documents: {e}")
-            return []
+            pipeline = IngestionPipeline(
+                collection,
+                self.embeddings,
+                processes=processes,
+                embed_batch_size=embed_batch_size,
+                embed_threads=embed_threads,
+                write_batch_size=write_batch_size
+            )
+            try:
+                _, stats["throughput"] = pipeline.run(changed_paths, on_file_done=file_done)
+            except Exception as e:
+                logger.error(f"Error ingesting documents from {docs_directory}: {e}")
+                stats["error"] = str(e)
+            manifest.pop("in_progress", None)
+        
+        # Deleting an edited file's old chunks changes the corpus even if its re-ingestion failed
+        changed = stats["added"] or stats["updated"] or stats["removed"] or edited or resumed
+        if resumed:
+            # Which companies the interrupted run touched is unknown; refresh them all
+            affected_companies |= {company_code_from_filename(filename) for filename in tracked}
+        if changed:
+            self._save_manifest(manifest)
+            self.bump_corpus_generation()
+        if changed or self.lexical_index is None:
+            self.build_lexical_index()
+        
+        # Rebuild snapshots for changed companies, plus any tracked company still missing one at this k
+        tracked_companies = {company_code_from_filename(filename) for filename in tracked}
+        affected_companies |= tracked_companies - self._snapshot_companies(DEFAULT_CONTEXT_K)
+        if affected_companies:
+            stats["snapshots_built"] = self.build_context_snapshots(affected_companies)
+        
+        logger.info(f"Document sync complete for {docs_directory}: {stats}")
+        return stats
     
-    def add_documents_to_store(self, documents: List[Document]):
-        """Add documents to the vector store"""
+    def add_documents_to_store(self, documents: Iterable[Document], batch_size: int = INGEST_WRITE_BATCH_SIZE):
+        """Add documents (any iterable, e.g. iter_documents_from_directory) in bounded batches"""
         try:
-            if documents:
-                self.vectorstore.add_documents(documents)
-                logger.info(f"Added {len(documents)} documents to vector store")
+            added = 0
+            batch = []
+            companies = set()
+            for doc in documents:
+                batch.append(doc)
+                if doc.metadata.get("company_code"):
+                    companies.add(doc.metadata["company_code"])
+                if len(batch) >= batch_size:
+                    self.vectorstore.add_documents(batch)
+                    added += len(batch)
+                    batch = []
+            if batch:
+                self.vectorstore.add_documents(batch)
+                added += len(batch)
+            
+            if added:
+                self.bump_corpus_generation()
+                self.build_lexical_index()
+                if companies:
+                    self.build_context_snapshots(companies)
+                logger.info(f"Added {added} documents to vector store")
             else:
                 logger.warning("No documents to add to vector store")
         except Exception as e:
             logger.error(f"Error adding documents to vector store: {e}")
     
     def setup_vector_store(self, docs_path: str = "./docs"):
-        """Initialize the vector store with research documents"""
-        try:
-            # Check if vector store already has documents
-            collection = self.client.get_collection(self.collection_name)
-            if collection.count() > 0:
-                logger.info(f"Vector store already contains {collection.count()} documents")
-                return
-        except:
-            # Collection doesn't exist yet, that's fine
-            pass
-        
-        # Load and add documents
+        """Initialize the vector store with research documents, re-ingesting only changed files"""
         docs_directory = os.path.join(os.path.dirname(__file__), docs_path)
         if os.path.exists(docs_directory):
-            documents = self.load_documents_from_directory(docs_directory)
-            if documents:
-                self.add_documents_to_store(documents)
-            else:
+            stats = self.sync_documents(docs_directory)
+            if not (stats["added"] or stats["updated"] or stats["unchanged"]):
                 logger.warning(f"No documents found in {docs_directory}")
         else:
             logger.error(f"Docs directory not found: {docs_directory}")
     
-    # private
-    def __search_similar_documents(self, query: str, company_code: str = None, k: int = 5) -> List[Document]:
-        """Search for similar documents in the vector store"""
+    def build_lexical_index(self, page_size: int = 5000) -> LexicalIndex:
+        """
+        Rebuild the BM25 index from every chunk in the collection and swap it in
+        
+        Chunks are streamed page by page and each page's text is dropped once tokenized,
+        so peak memory is one page plus the postings, not the corpus text.
+        """
+        collection = self.client.get_or_create_collection(self.collection_name)
+        
+        def chunks():
+            offset = 0
+            while True:
+                page = collection.get(include=["documents", "metadatas"], limit=page_size, offset=offset)
+                if not page["ids"]:
+                    return
+                for chunk_id, text, metadata in zip(page["ids"], page["documents"], page["metadatas"]):
+                    yield chunk_id, text, (metadata or {}).get("company_code", "UNKNOWN")
+                offset += len(page["ids"])
+        
         try:
-            # Build filter if company code is specified
-            filter_dict = None
-            if company_code:
-                filter_dict = {"company_code": company_code}
+            index = LexicalIndex(chunks())
+        except Exception as e:
+            logger.error(f"Error reading chunks for the lexical index: {e}")
+            return self.lexical_index
+        
+        self.lexical_index = index
+        logger.info(f"Lexical index built: {index.get_stats()}")
+        return index
+    
+    def _embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embed queries in one encoder call, reusing vectors for query text seen before"""
+        embeddings = {}
+        with self._cache_lock:
+            for query in queries:
+                embedding = self._embedding_cache.get(query)
+                if embedding is not None:
+                    self._embedding_cache.move_to_end(query)
+                    self._cache_counters["embedding_hits"] += 1
+                    embeddings[query] = embedding
+            missing = list(dict.fromkeys(query for query in queries if query not in embeddings))
+            self._cache_counters["embedding_misses"] += len(missing)
+        
+        if missing:
+            with EMBEDDING_SECONDS.time():
+                if len(missing) == 1:
+                    vectors = [self.embeddings.embed_query(missing[0])]
+                else:
+                    vectors = self.embeddings.embed_documents(missing)
             
-            # Search similar documents
-            results = self.vectorstore.similarity_search(
-                query, 
-                k=k,
-                filter=filter_dict
-            )
+            with self._cache_lock:
+                for query, embedding in zip(missing, vectors):
+                    embeddings[query] = embedding
+                    self._embedding_cache[query] = embedding
+                while len(self._embedding_cache) > RETRIEVAL_EMBEDDING_CACHE_SIZE:
+                    self._embedding_cache.popitem(last=False)
+        return [embeddings[query] for query in queries]
+    
+    def _embed_query(self, query: str) -> List[float]:
+        """Embed a query, reusing the vector for query text seen before"""
+        return self._embed_queries([query])[0]
+    
+    def search_documents_batch(self, queries: List[str], company_code: str = None, k: int = 5) -> List[List[Document]]:
+        """
+        Search for several queries at once: one ranked document list per query
+        
+        Queries not in the result cache are embedded in one encoder call and sent as one
+        multi-query Chroma request with a shared company filter. A chunk returned for
+        several queries is the same Document object in each list.
+        """
+        try:
+            results = [None] * len(queries)
+            pending = OrderedDict()
+            with self._cache_lock:
+                generation = self.corpus_generation
+                for i, query in enumerate(queries):
+                    cached = self._result_cache.get((query, company_code, k))
+                    if cached is not None and cached[0] == generation:
+                        self._result_cache.move_to_end((query, company_code, k))
+                        self._cache_counters["result_hits"] += 1
+                        results[i] = list(cached[1])
+                    else:
+                        self._cache_counters["result_misses"] += 1
+                        pending.setdefault(query, []).append(i)
             
-            logger.info(f"Found {len(results)} similar documents for query: {query[:50]}...")
+            if pending:
+                searched = self._hybrid_search_many(list(pending), company_code, k)
+                with self._cache_lock:
+                    for (query, positions), docs in zip(pending.items(), searched):
+                        self._result_cache[(query, company_code, k)] = (generation, docs)
+                        self._result_cache.move_to_end((query, company_code, k))
+                        for i in positions:
+                            results[i] = list(docs)
+                    while len(self._result_cache) > RETRIEVAL_RESULT_CACHE_SIZE:
+                        self._result_cache.popitem(last=False)
+            
+            logger.info(f"Found {sum(len(docs) for docs in results)} similar documents for {len(queries)} queries")
             return results
             
         except Exception as e:
             logger.error(f"Error searching documents: {e}")
-            return []
+            return [[] for _ in queries]
+    
+    # private
+    def __search_similar_documents(self, query: str, company_code: str = None, k: int = 5) -> List[Document]:
+        """Search for similar documents in the vector store"""
+        return self.search_documents_batch([query], company_code, k)[0]
+    
+    def _dense_search_many(self, queries: List[str], company_code: str = None, k: int = 5) -> List["OrderedDict[str, Document]"]:
+        """Embedding search in Chroma, all queries in one request: per query, chunk ID -> Document, best first"""
+        # Build filter if company code is specified
+        filter_dict = None
+        if company_code:
+            filter_dict = {"company_code": company_code}
+        
+        # Embedding and vector query are timed separately
+        embeddings = self._embed_queries(queries)
+        collection = self.client.get_or_create_collection(self.collection_name)
+        with VECTOR_SEARCH_SECONDS.time():
+            results = collection.query(
+                query_embeddings=embeddings,
+                n_results=k,
+                where=filter_dict,
+                include=["documents", "metadatas"]
+            )
+        
+        # Hits shared between queries become one Document
+        documents = {}
+        rankings = []
+        for i in range(len(queries)):
+            docs = OrderedDict()
+            if results["ids"] and i < len(results["ids"]):
+                for chunk_id, content, metadata in zip(results["ids"][i], results["documents"][i], results["metadatas"][i]):
+                    if chunk_id not in documents:
+                        documents[chunk_id] = Document(page_content=content, metadata={**(metadata or {}), "chunk_id": chunk_id})
+                    docs[chunk_id] = documents[chunk_id]
+            rankings.append(docs)
+        return rankings
+    
+    def _dense_search(self, query: str, company_code: str = None, k: int = 5) -> "OrderedDict[str, Document]":
+        """Embedding search in Chroma: chunk ID -> Document, best first"""
+        return self._dense_search_many([query], company_code, k)[0]
+    
+    def _hybrid_search_many(self, queries: List[str], company_code: str = None, k: int = 5) -> List[List[Document]]:
+        """
+        Fuse dense and BM25 rankings with reciprocal rank fusion, per query
+        
+        Queries whose lexical results alone yield k strong hits (each matching the query's
+        terms up to LEXICAL_STRONG_COVERAGE of its IDF mass) skip the embedding search; the
+        rest share one batched dense search.
+        """
+        index = self.lexical_index
+        if not HYBRID_SEARCH or index is None or not len(index):
+            return [list(docs.values()) for docs in self._dense_search_many(queries, company_code, k)]
+        
+        rankings = [None] * len(queries)
+        dense_queries = []
+        for i, query in enumerate(queries):
+            lexical = index.search(query, company_code, k)
+            strong = [chunk_id for chunk_id, _, coverage in lexical if coverage >= LEXICAL_STRONG_COVERAGE]
+            if len(strong) >= k:
+                with self._cache_lock:
+                    self._cache_counters["lexical_early_stops"] += 1
+                rankings[i] = strong[:k]
+            else:
+                dense_queries.append((i, [chunk_id for chunk_id, _, _ in lexical]))
+        
+        documents = {}
+        if dense_queries:
+            dense_results = self._dense_search_many([queries[i] for i, _ in dense_queries], company_code, k)
+            for (i, lexical_ids), dense in zip(dense_queries, dense_results):
+                documents.update(dense)
+                rankings[i] = reciprocal_rank_fusion([list(dense), lexical_ids])[:k]
+        
+        # Lexical-only hits still need their text and metadata; fetched once across all queries
+        missing = list(dict.fromkeys(chunk_id for ranked in rankings for chunk_id in ranked if chunk_id not in documents))
+        if missing:
+            collection = self.client.get_or_create_collection(self.collection_name)
+            fetched = collection.get(ids=missing, include=["documents", "metadatas"])
+            for chunk_id, content, metadata in zip(fetched["ids"], fetched["documents"], fetched["metadatas"]):
+                documents[chunk_id] = Document(page_content=content, metadata={**(metadata or {}), "chunk_id": chunk_id})
+        return [[documents[chunk_id] for chunk_id in ranked if chunk_id in documents] for ranked in rankings]
+    
+    def _hybrid_search(self, query: str, company_code: str = None, k: int = 5) -> List[Document]:
+        """Hybrid search for a single query"""
+        return self._hybrid_search_many([query], company_code, k)[0]
+    
+    @staticmethod
+    def _default_query(company_code: str) -> str:
+        """Query used when no specific query is given: general company information"""
+        return f"{company_code} financial performance business overview"
+    
+    @staticmethod
+    def _format_context(contents: List[str]) -> str:
+        """Combine the content from retrieved documents"""
+        context_parts = []
+        for i, content in enumerate(contents):
+            content = content.strip()
+            if content:
+                context_parts.append(f"Context {i+1}:\n{content}")
+        return "\n\n".join(context_parts)
+    
+    def _snapshot_companies(self, k: int = DEFAULT_CONTEXT_K) -> set:
+        with self._snapshot_lock:
+            rows = self._snapshot_db.execute("SELECT company_code FROM context_snapshots WHERE k = ?", (k,)).fetchall()
+        return {row[0] for row in rows}
+    
+    def build_context_snapshots(self, company_codes, k: int = DEFAULT_CONTEXT_K) -> int:
+        """
+        Materialize the default-query context for each company (ranked chunk IDs plus the
+        pre-joined context text) so the request path can serve it without embedding or searching
+        """
+        built = 0
+        for company_code in sorted(company_codes):
+            try:
+                docs = self._hybrid_search(self._default_query(company_code), company_code, k)
+                chunk_ids = [doc.metadata["chunk_id"] for doc in docs]
+                contents = [doc.page_content for doc in docs]
+            except Exception as e:
+                logger.error(f"Error building context snapshot for {company_code}: {e}")
+                continue
+            
+            with self._snapshot_lock:
+                if chunk_ids:
+                    self._snapshot_db.execute(
+                        "INSERT OR REPLACE INTO context_snapshots (company_code, k, chunk_ids, context, built_at) VALUES (?, ?, ?, ?, ?)",
+                        (company_code, k, json.dumps(chunk_ids), self._format_context(contents), time.time())
+                    )
+                    built += 1
+                else:
+                    # Company no longer has any documents
+                    self._snapshot_db.execute("DELETE FROM context_snapshots WHERE company_code = ?", (company_code,))
+                self._snapshot_db.commit()
+        
+        logger.info(f"Built {built} context snapshots")
+        return built
+    
+    def _get_context_snapshot(self, company_code: str, k: int):
+        """Return the snapshot context for company_code at this k, or None"""
+        with self._snapshot_lock:
+            row = self._snapshot_db.execute(
+                "SELECT context FROM context_snapshots WHERE company_code = ? AND k = ?", (company_code, k)
+            ).fetchone()
+        with self._cache_lock:
+            self._cache_counters["snapshot_hits" if row else "snapshot_misses"] += 1
+        return row[0] if row else None
     
-    def get_context_for_company(self, company_code: str, query: str = "", k: int = 10) -> str:
+    def get_context_for_company(self, company_code: str, query: str = "", k: int = DEFAULT_CONTEXT_K) -> str:
         """Get relevant context for a specific company"""
         try:
+            # The default context is precomputed at ingest time
+            if not query:
+                snapshot = self._get_context_snapshot(company_code, k)
+                if snapshot is not None:
+                    return snapshot
+            
             # If no specific query, get general company information
-            search_query = query if query else f"{company_code} financial performance business overview"
+            search_query = query if query else self._default_query(company_code)
             
             # Search for relevant documents
             docs = self.__search_similar_documents(search_query, company_code, k)
@@ -144,14 +748,7 @@ class ResearchVectorStore:
             if not docs:
                 return f"No research context found for {company_code}"
             
-            # Combine the content from retrieved documents
-            context_parts = []
-            for i, doc in enumerate(docs):
-                content = doc.page_content.strip()
-                if content:
-                    context_parts.append(f"Context {i+1}:\n{content}")
-            
-            context = "\n\n".join(context_parts)
+            context = self._format_context([doc.page_content for doc in docs])
             
             logger.info(f"Retrieved {len(docs)} context documents for {company_code}")
             return context
@@ -160,6 +757,50 @@ class ResearchVectorStore:
             logger.error(f"Error getting context for {company_code}: {e}")
             return f"Error retrieving context for {company_code}: {str(e)}"
     
+    def get_contexts_for_company(self, company_code: str, queries: List[str], k: int = DEFAULT_CONTEXT_K) -> List[str]:
+        """Get one context per query for a company, retrieved as a single batch"""
+        try:
+            results = self.search_documents_batch(queries, company_code, k)
+            logger.info(f"Retrieved {sum(len(docs) for docs in results)} context documents for {company_code} ({len(queries)} queries)")
+            return [
+                self._format_context([doc.page_content for doc in docs]) if docs
+                else f"No research context found for {company_code}"
+                for docs in results
+            ]
+        except Exception as e:
+            logger.error(f"Error getting contexts for {company_code}: {e}")
+            return [f"Error retrieving context for {company_code}: {str(e)}" for _ in queries]
+    
+    def get_merged_context_for_company(self, company_code: str, queries: List[str], k: int = DEFAULT_CONTEXT_K) -> str:
+        """
+        Get one context covering several aspects of a company (e.g. risks, financials, valuation)
+        
+        The queries are retrieved as a single batch; their hits are deduplicated by chunk ID
+        and ordered by reciprocal rank fusion across the queries.
+        """
+        try:
+            results = self.search_documents_batch(queries, company_code, k)
+            documents = {doc.metadata["chunk_id"]: doc for docs in results for doc in docs}
+            ranked = reciprocal_rank_fusion([[doc.metadata["chunk_id"] for doc in docs] for docs in results])
+            if not ranked:
+                return f"No research context found for {company_code}"
+            logger.info(f"Retrieved {len(ranked)} distinct context documents for {company_code} ({len(queries)} queries)")
+            return self._format_context([documents[chunk_id].page_content for chunk_id in ranked])
+        except Exception as e:
+            logger.error(f"Error getting context for {company_code}: {e}")
+            return f"Error retrieving context for {company_code}: {str(e)}"
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Get retrieval cache hit/miss counters and sizes"""
+        with self._cache_lock:
+            return {
+                **self._cache_counters,
+                "embedding_entries": len(self._embedding_cache),
+                "result_entries": len(self._result_cache),
+                "corpus_generation": self.corpus_generation,
+                "lexical_index": self.lexical_index.get_stats() if self.lexical_index else None
+            }
+    
     def get_collection_stats(self) -> Dict[str, Any]:
         """Get statistics about the vector store collection"""
         try:
@@ -167,7 +808,8 @@ class ResearchVectorStore:
             return {
                 "total_documents": collection.count(),
                 "collection_name": self.collection_name,
-                "persist_directory": self.persist_directory
+                "persist_directory": self.persist_directory,
+                "corpus_generation": self.corpus_generation
             }
         except Exception as e:
             logger.error(f"Error getting collection stats: {e}")
@@ -175,13 +817,22 @@ class ResearchVectorStore:
 
 # Global instance
 research_vectorstore = None
+_research_vectorstore_lock = threading.Lock()
 
 def get_research_vectorstore() -> ResearchVectorStore:
-    """Get or create the global research vector store instance"""
+    """Get or create the global research vector store instance (a client of the retrieval service if configured)"""
     global research_vectorstore
     if research_vectorstore is None:
-        research_vectorstore = ResearchVectorStore()
-        research_vectorstore.setup_vector_store()
+        # Background warmup and early requests may race to create it; build it once
+        with _research_vectorstore_lock:
+            if research_vectorstore is None:
+                if RETRIEVAL_SERVICE_SOCKET:
+                    from retrieval_service import RemoteResearchVectorStore
+                    vectorstore = RemoteResearchVectorStore(RETRIEVAL_SERVICE_SOCKET)
+                else:
+                    vectorstore = ResearchVectorStore()
+                    vectorstore.setup_vector_store()
+                research_vectorstore = vectorstore
     return research_vectorstore
 
 def initialize_vector_store():